@@ -0,0 +1,181 @@
+"""Benchmarks for the UPF path engine.
+
+Builds seeded random or clustered UPF layouts, times topology construction,
+rename_upfs, exact-hop routing and assign_and_calculate, and writes the wall
+time, peak traced memory and expanded labels of every case to JSON.
+
+    python benchmarks/bench_routing.py --sizes 10 100 1000 --hops 3 5
+    python benchmarks/bench_routing.py --compare bench_routing.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from interface import assign_and_calculate
+from utils.upf_network import UPFNetwork, rename_upfs
+
+
+def make_layout(layout, num_upfs, seed, area=100.0):
+    """UPF and PSA coordinates, uniform or gathered around a few metro areas."""
+    rng = random.Random(seed)
+    if layout == "clustered":
+        centers = [(rng.uniform(0, area), rng.uniform(0, area)) for _ in range(max(1, num_upfs // 200 + 2))]
+        spread = area / 20
+        upfs = []
+        for _ in range(num_upfs):
+            cx, cy = rng.choice(centers)
+            upfs.append((rng.gauss(cx, spread), rng.gauss(cy, spread)))
+    else:
+        upfs = [(rng.uniform(0, area), rng.uniform(0, area)) for _ in range(num_upfs)]
+    psa = (rng.uniform(0, area), rng.uniform(0, area))
+    gnbs = [(rng.uniform(0, area), rng.uniform(0, area)) for _ in range(max(1, num_upfs // 10))]
+    return upfs, psa, gnbs
+
+
+def build_network(upfs, psa, topology, k_nearest):
+    network = UPFNetwork()
+    for i, pos in enumerate(upfs, 1):
+        network.add_upf(f"upf{i}", pos)
+    network.set_psa(psa)
+    if topology == "mesh":
+        network.connect_all()
+    else:
+        network.connect_nearest(k_nearest)
+    return network
+
+
+def measure(fn, memory=True):
+    """Run fn twice: once timed, once under tracemalloc for the peak."""
+    start = time.perf_counter()
+    result = fn()
+    wall = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, wall, peak
+
+
+def run_case(layout, num_upfs, m, args):
+    upfs, psa, gnbs = make_layout(layout, num_upfs, args.seed)
+    topology = "mesh" if num_upfs <= args.mesh_limit else "knn"
+    records = []
+
+    def record(case, wall, peak, expanded=None):
+        records.append({"layout": layout, "topology": topology, "upfs": num_upfs, "m": m,
+                        "case": case, "wall_s": wall, "peak_bytes": peak, "expanded": expanded})
+
+    network, wall, peak = measure(lambda: build_network(upfs, psa, topology, args.k_nearest), args.memory)
+    record("build", wall, peak)
+
+    # A few edge UPFs near gNBs, routed toward the PSA
+    edges = list(dict.fromkeys(network.nearest_upfs(pos)[0][0] for pos in gnbs[:args.routes]))
+    network.edge_upfs = edges
+    network.cache_size = 0
+    if m <= num_upfs + 1:
+        for mode, astar, prune in (("route", False, False), ("route_astar", True, False),
+                                   ("route_pruned", False, True), ("route_astar_pruned", True, True)):
+            expanded = []
+
+            def route_all():
+                expanded.clear()
+                # Each case builds its own bounds
+                network.clear_cache()
+                for edge in edges:
+                    try:
+                        network.constrained_dijkstra(edge, network.psa_upf, m, astar=astar, prune=prune)
+                    except ValueError:
+                        pass
+                    expanded.append(network.expanded)
+
+            _, wall, peak = measure(route_all, args.memory)
+            record(mode, wall, peak, sum(expanded))
+
+    _, wall, peak = measure(lambda: rename_upfs(network, set(network.edge_upfs)), args.memory)
+    record("rename_upfs", wall, peak)
+
+    if num_upfs <= args.assign_limit:
+        def assign():
+            fresh = build_network(upfs, psa, topology, args.k_nearest)
+            named = {f"gnb{i}": pos for i, pos in enumerate(gnbs, 1)}
+            with redirect_stdout(io.StringIO()):
+                assign_and_calculate(fresh, named, 2 * len(named), num_upfs, m, batched=True)
+
+        _, wall, peak = measure(assign, args.memory)
+        record("assign_and_calculate", wall, peak)
+    return records
+
+
+def compare(results, baseline_path, tolerance):
+    """Cases slower than `tolerance` times their baseline wall time."""
+    with open(baseline_path) as f:
+        baseline = {(r["layout"], r["upfs"], r["m"], r["case"]): r["wall_s"] for r in json.load(f)["results"]}
+    slower = []
+    for r in results:
+        before = baseline.get((r["layout"], r["upfs"], r["m"], r["case"]))
+        if before and r["wall_s"] > tolerance * before:
+            slower.append((r, before))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UPF path engine benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="UPF counts")
+    parser.add_argument("--hops", type=int, nargs="+", default=[3, 5, 8], help="Values of m")
+    parser.add_argument("--layouts", nargs="+", default=["random", "clustered"], choices=["random", "clustered"])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--routes", type=int, default=5, help="Edge UPFs routed per case")
+    parser.add_argument("--mesh-limit", type=int, default=1000, help="Largest UPF count built as a full mesh")
+    parser.add_argument("--k-nearest", type=int, default=8, help="Neighbors per UPF above the mesh limit")
+    parser.add_argument("--assign-limit", type=int, default=1000, help="Largest UPF count run through assign_and_calculate")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip the tracemalloc runs")
+    parser.add_argument("-o", "--output", default="bench_routing.json")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor against --compare")
+    args = parser.parse_args()
+
+    results = []
+    for layout in args.layouts:
+        for num_upfs in args.sizes:
+            for m in args.hops:
+                for r in run_case(layout, num_upfs, m, args):
+                    results.append(r)
+                    peak = f"{r['peak_bytes'] / 1e6:9.2f} MB" if r["peak_bytes"] is not None else "        -"
+                    expanded = r["expanded"] if r["expanded"] is not None else "-"
+                    print(f"{layout:9} {r['topology']:4} n={num_upfs:<6} m={m:<3} {r['case']:21} "
+                          f"{r['wall_s'] * 1000:10.2f} ms {peak}  expanded={expanded}")
+
+    report = {
+        "meta": {"date": datetime.now().isoformat(timespec="seconds"), "seed": args.seed,
+                 "python": platform.python_version(), "numpy": np.__version__},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        slower = compare(results, args.compare, args.tolerance)
+        for r, before in slower:
+            print(f"✖ {r['layout']} n={r['upfs']} m={r['m']} {r['case']}: "
+                  f"{r['wall_s'] * 1000:.2f} ms vs {before * 1000:.2f} ms")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Regression check of the UPF path engine against the original solver.
+
+The original constrained_dijkstra copied the whole path into every heap
+entry and popped complete paths in cost order. It is slow but obviously
+exact, so it is kept here as the reference: seeded random networks (full
+mesh, sparse, great-circle) are routed by both and every answer compared,
+for plain, A*, delay-budget, link-capacity and pre-pruned searches, for
+k_best_paths(), constrained_paths_to() and hop_table().
+
+    python benchmarks/check_routing.py --graphs 400
+"""
+import os
+import sys
+import heapq
+import random
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.distance import link_bandwidth
+from utils.upf_network import UPFNetwork, rename_upfs
+
+TOLERANCE = 1e-6
+
+
+def baseline_paths(network, start, end, exact_hops, alpha=1.0, beta=0.5, delay_budget=None, demand=None):
+    """Yield (path, cost) of simple exact-hop paths in cost order, copying paths like the old solver.
+
+    Paths over `delay_budget` or through links without `demand` Mbps of
+    residual capacity are dropped as soon as they appear.
+    """
+    graph = {upf: network.neighbors(upf) for upf in network.names}
+    heap = [(0, 1, start, [start])]
+    while heap:
+        current_cost, current_len, current_node, path = heapq.heappop(heap)
+        if current_len == exact_hops:
+            if current_node == end:
+                yield path, current_cost
+            continue
+        for neighbor, distance in graph[current_node].items():
+            if neighbor in path:
+                continue
+            if neighbor in network.edge_upfs and neighbor != end:
+                continue
+            if neighbor == end and current_len + 1 != exact_hops:
+                continue
+            new_path = path + [neighbor]
+            if delay_budget is not None and network.path_delay(new_path) > delay_budget:
+                continue
+            if demand is not None and network.residual_capacity(current_node, neighbor) < demand:
+                continue
+            new_cost = current_cost + alpha * distance + beta * network.upf_loads[neighbor]
+            heapq.heappush(heap, (new_cost, current_len + 1, neighbor, new_path))
+
+
+def baseline_best(network, start, end, exact_hops, **constraints):
+    return next(baseline_paths(network, start, end, exact_hops, **constraints), None)
+
+
+def random_network(seed, n, topology):
+    rng = random.Random(seed)
+    network = UPFNetwork("haversine" if topology == "haversine" else "planar")
+    # About 100 km across for great-circle networks, so link capacities vary
+    scale = 1.0 if topology == "haversine" else 10.0
+    for i in range(n):
+        network.add_upf(f"upf{i}", (45 + rng.uniform(0, scale), 5 + rng.uniform(0, scale)))
+    network.set_psa((45 + rng.uniform(0, scale), 5 + rng.uniform(0, scale)))
+    names = list(network.upf_positions)
+    if topology == "sparse":
+        for a, b in itertools.combinations(names, 2):
+            if rng.random() < 0.35:
+                network.connect_upfs(a, b)
+    else:
+        network.connect_all()
+    for upf in names:
+        network.upf_loads[upf] += rng.randint(0, 3)
+        network.upf_delays[upf] = rng.choice([0.01, 0.05, 0.2])
+    edges = set(rng.sample(names[:-1], 2))
+    network.edge_upfs = edges
+    rename_upfs(network, edges)
+    if topology == "haversine":
+        network.capacity_model = lambda km: link_bandwidth(km, attenuation_db_per_km=0.5)
+    else:
+        network.capacity_model = lambda d: link_bandwidth(d, attenuation_db_per_km=0.5)
+    network.cache_size = 0
+    return network, rng
+
+
+def same(got, want):
+    if got is None or want is None:
+        return got is None and want is None
+    return abs(got[1] - want[1]) <= TOLERANCE
+
+
+def solve(network, *args, **kwargs):
+    try:
+        return network.constrained_dijkstra(*args, **kwargs)
+    except ValueError:
+        return None
+
+
+def check_network(seed, n, topology, report):
+    network, rng = random_network(seed, n, topology)
+    psa = network.psa_upf
+    edges = sorted(network.edge_upfs)
+    for m in range(2, min(n, 6) + 1):
+        for edge in edges:
+            want = baseline_best(network, edge, psa, m)
+            for astar, prune in ((False, False), (True, False), (False, True), (True, True)):
+                report(same(solve(network, edge, psa, m, astar=astar, prune=prune), want),
+                       f"route astar={astar} prune={prune}", seed, m, edge)
+
+            budget = rng.choice([0.2, 0.4, 0.9])
+            want = baseline_best(network, edge, psa, m, delay_budget=budget)
+            for astar in (False, True):
+                report(same(solve(network, edge, psa, m, astar=astar, delay_budget=budget, prune=True), want),
+                       f"delay budget {budget} astar={astar}", seed, m, edge)
+
+            demand = rng.choice([120, 300, 600])
+            want = baseline_best(network, edge, psa, m, demand=demand)
+            report(same(solve(network, edge, psa, m, demand=demand, prune=True), want),
+                   f"demand {demand}", seed, m, edge)
+
+            want = [cost for _, cost in itertools.islice(baseline_paths(network, edge, psa, m), 4)]
+            got = [cost for _, cost in network.k_best_paths(edge, psa, m, 4)]
+            report(len(got) == len(want) and all(abs(a - b) <= TOLERANCE for a, b in zip(got, want)),
+                   "k_best_paths", seed, m, edge)
+
+        batch = network.constrained_paths_to(psa, edges, m)
+        for edge in edges:
+            report(same(batch[edge], baseline_best(network, edge, psa, m)), "constrained_paths_to", seed, m, edge)
+
+    for edge in edges:
+        table = network.hop_table(edge, psa, min(n, 6))
+        for m in range(2, min(n, 6) + 1):
+            report(same(table.get(m), baseline_best(network, edge, psa, m)), "hop_table", seed, m, edge)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the path engine against the original path-copying solver")
+    parser.add_argument("--graphs", type=int, default=300, help="Random networks per topology")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    checked = 0
+    failures = []
+
+    def report(ok, case, seed, m, edge):
+        nonlocal checked
+        checked += 1
+        if not ok:
+            failures.append((case, seed, m, edge))
+
+    for topology in ("mesh", "sparse", "haversine"):
+        for seed in range(args.seed, args.seed + args.graphs):
+            check_network(seed, 4 + seed % 7, topology, report)
+
+    for case, seed, m, edge in failures[:20]:
+        print(f"✖ {case}: seed={seed} m={m} from {edge}")
+    print(f"{'✅' if not failures else '❌'} {checked} answers checked, {len(failures)} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
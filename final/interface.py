@@ -1,102 +1,16 @@
-import math
-import heapq
+import io
+import sys
+import json
 import random
 import argparse
 from collections import defaultdict
+from contextlib import redirect_stdout
 
-class UPFNetwork:
-    def __init__(self):
-        self.graph = defaultdict(dict)
-        self.upf_loads = defaultdict(int)
-        self.upf_positions = {}
-        self.psa_position = None
-        self.psa_upf = "psa"
-        self.edge_upfs = set()
-
-    def add_upf(self, upf_id, position):
-        self.upf_positions[upf_id] = position
-
-    def set_psa(self, position):
-        self.psa_position = position
-        self.upf_positions[self.psa_upf] = position
-
-    def connect_upfs(self, upf1, upf2):
-        distance = math.dist(self.upf_positions[upf1], self.upf_positions[upf2])
-        self.graph[upf1][upf2] = distance
-        self.graph[upf2][upf1] = distance
-
-    def get_path_cost(self, path, alpha=1.0, beta=0.5):
-        total_cost = 0
-        for i in range(len(path)-1):
-            current = path[i]
-            next_node = path[i+1]
-            distance = self.graph[current][next_node]
-            load_cost = self.upf_loads[next_node]
-            total_cost += alpha * distance + beta * load_cost
-        return total_cost
-
-    def constrained_dijkstra(self, start, end, exact_hops, alpha=1.0, beta=0.5):
-        heap = []
-        heapq.heappush(heap, (0, 1, start, [start]))
-
-        while heap:
-            current_cost, current_len, current_node, path = heapq.heappop(heap)
-
-            if current_len == exact_hops:
-                if current_node == end:
-                    return path, current_cost
-                continue
-
-            for neighbor, distance in self.graph[current_node].items():
-                if neighbor in path:
-                    continue
-                if neighbor in self.edge_upfs and neighbor != end:
-                    continue
-                new_path = path + [neighbor]
-                step_cost = alpha * distance + beta * self.upf_loads[neighbor]
-                new_cost = current_cost + step_cost
-                heapq.heappush(heap, (new_cost, current_len + 1, neighbor, new_path))
-
-        raise ValueError(f"No valid path of exactly {exact_hops} nodes from {start} to {end}")
-
-
-def rename_upfs(network, edge_upfs):
-    renamed_positions = {}
-    renamed_loads = {}
-    renamed_graph = defaultdict(dict)
-    old_to_new = {}
-    i = 1
-    j = 1
-
-    for upf in network.upf_positions:
-        if upf == network.psa_upf:
-            new_name = network.psa_upf
-        elif upf in edge_upfs:
-            new_name = f"edge-upf{i}"
-            i += 1
-        else:
-            new_name = f"i-up{j}"
-            j += 1
-        old_to_new[upf] = new_name
-
-    # Update positions and loads
-    for old, new in old_to_new.items():
-        renamed_positions[new] = network.upf_positions[old]
-        renamed_loads[new] = network.upf_loads[old]
-
-    # Update graph
-    for old_src, neighbors in network.graph.items():
-        new_src = old_to_new[old_src]
-        for old_dst, dist in neighbors.items():
-            new_dst = old_to_new[old_dst]
-            renamed_graph[new_src][new_dst] = dist
-
-    # Apply changes to network
-    network.upf_positions = renamed_positions
-    network.upf_loads = renamed_loads
-    network.graph = renamed_graph
-    network.edge_upfs = {old_to_new[u] for u in edge_upfs}
-    return old_to_new
+from utils.upf_network import UPFNetwork, rename_upfs
+from utils.joint_assignment import optimize_assignment
+from utils.scenarios import load_scenarios, build_network
+from utils.search_stats import SearchStats
+from utils.distance import link_bandwidth
 
 
 def get_coordinates(prompt, default=None, random_range=10):
@@ -113,12 +27,12 @@ def get_coordinates(prompt, default=None, random_range=10):
             print("Invalid input. Enter two numbers separated by space.")
 
 
-def generate_network(num_ue, num_upfs, m, skip=False):
+def generate_network(num_ue, num_upfs, m, skip=False, k_nearest=None, radius=None, metric="planar"):
     print("\n🔧 Configuring network...")
     max_e = num_upfs - m + 1
     print(f"📈 Maximum edge UPFs allowed: {max_e}")
 
-    network = UPFNetwork()
+    network = UPFNetwork(metric)
     num_gnb = num_ue // 2
     gnbs = {}
 
@@ -139,36 +53,37 @@ def generate_network(num_ue, num_upfs, m, skip=False):
     network.set_psa(psa_pos)
     print(f"  ➤ PSA: {psa_pos}")
 
-    all_upfs = list(network.upf_positions.keys())
-    for i in range(len(all_upfs)):
-        for j in range(i+1, len(all_upfs)):
-            network.connect_upfs(all_upfs[i], all_upfs[j])
+    if k_nearest or radius is not None:
+        # Sparse topology: edges grow linearly with the number of UPFs
+        network.connect_nearest(k_nearest, radius)
+        print(f"\n🕸 Connected UPFs to their nearest neighbors (k={k_nearest}, radius={radius})")
+    else:
+        network.connect_all()
 
     return network, gnbs, max_e
 
 
-def assign_and_calculate(network, gnbs, num_ue, num_upfs, m, alpha=1.0, beta=0.5):
+def assign_and_calculate(network, gnbs, num_ue, num_upfs, m, alpha=1.0, beta=0.5, *, batched=False,
+                         optimize=False, capacity=None, workers=None, astar=False, delay_budget=None,
+                         ue_demand=None, backup=False, hop_table=None, prune=False):
     edge_upfs = set()
     gnb_assignments = {}
-
-    for gnb_id, gnb_pos in gnbs.items():
-        min_cost = float('inf')
-        best_upf = None
-
-        for upf_id in network.upf_positions:
-            if upf_id == network.psa_upf:
-                continue
-            distance = math.dist(gnb_pos, network.upf_positions[upf_id])
-            load = network.upf_loads[upf_id]
-            cost = alpha * distance + beta * load
-            if cost < min_cost:
-                min_cost = cost
-                best_upf = upf_id
-
-        best_upf = best_upf or network.psa_upf
-        gnb_assignments[gnb_id] = best_upf
-        edge_upfs.add(best_upf)
-        network.upf_loads[best_upf] += 1
+    planned_paths = {}
+
+    if optimize:
+        # Joint assignment and routing, solved before any load is applied
+        gnb_assignments, planned_paths = optimize_assignment(network, gnbs, m, alpha, beta, capacity)
+        for best_upf in gnb_assignments.values():
+            edge_upfs.add(best_upf)
+            network.upf_loads[best_upf] += 1
+    else:
+        # Loads only grow while gNBs are assigned, so this stays a lower bound
+        min_load = min(network.upf_loads.values())
+        for gnb_id, gnb_pos in gnbs.items():
+            best_upf = network.select_edge_upf(gnb_pos, alpha, beta, min_load)
+            gnb_assignments[gnb_id] = best_upf
+            edge_upfs.add(best_upf)
+            network.upf_loads[best_upf] += 1
 
     network.edge_upfs = edge_upfs
     rename_map = rename_upfs(network, edge_upfs)
@@ -196,16 +111,87 @@ def assign_and_calculate(network, gnbs, num_ue, num_upfs, m, alpha=1.0, beta=0.5
     print(f"🛡 PSA UPF: {network.psa_upf} at {network.psa_position}")
 
     print(f"\n🚚 Paths from edge UPFs to PSA (max {m-1} intermediate UPFs):")
-    for edge in network.edge_upfs:
-        if edge == network.psa_upf:
-            continue
+    edges = [edge for edge in network.edge_upfs if edge != network.psa_upf]
+    demands = {}
+    if ue_demand is not None:
+        # Links get the bandwidth apply_distance() later shapes them to, and
+        # each edge UPF carries the demand of the UEs behind its gNBs
+        if network.capacity_model is None:
+            network.capacity_model = link_bandwidth
+        demands = {edge: ue_demand * 2 * len(edge_to_gnbs[edge]) for edge in edges}
+        flow = network.max_flow(demands)
+        total = sum(demands.values())
+        print(f"🧮 Max-flow check: {flow:.0f} of {total:.0f} Mbps can reach the PSA")
+        if flow < total - 1e-6:
+            print("  ⚠ Some UEs cannot be served without oversubscribing a link")
+    hop_tables = {}
+    if hop_table:
+        # Cost of every path length before any path loads are applied
+        print(f"\n📐 Best cost by number of UPFs on the path (m up to {hop_table}, * = Pareto):")
+        for edge in edges:
+            table = network.hop_table(edge, network.psa_upf, hop_table, alpha, beta)
+            frontier = {row[0] for row in network.pareto_frontier(table)}
+            hop_tables[edge] = {hops: cost for hops, (_, cost) in table.items()}
+            row = ", ".join(f"m={hops}: {cost:.2f}{'*' if hops in frontier else ''}"
+                            for hops, cost in hop_tables[edge].items())
+            print(f"  ➤ {edge}: {row or 'no path'}")
+        print()
+    # Batched searches have no delay budget or link capacities; such edges
+    # are routed one by one
+    batched = (batched or bool(workers)) and delay_budget is None and ue_demand is None
+    if batched:
+        # One search rooted at the PSA, every edge UPF sees the same loads;
+        # loads are then applied in edge order whatever the worker count
+        batch = network.constrained_paths_to(network.psa_upf, edges, m, alpha, beta, workers)
+    paths = {}
+    for edge in edges:
         try:
-            path, cost = network.constrained_dijkstra(edge, network.psa_upf, m, alpha, beta)
-            print(f"  ➤ {edge}: {' -> '.join(path)} (cost: {cost:.2f}, hops: {len(path)-1})")
+            if optimize:
+                if reverse_map[edge] not in planned_paths:
+                    raise ValueError(f"No valid path of exactly {m} nodes from {edge} to {network.psa_upf}")
+                path = [rename_map[upf] for upf in planned_paths[reverse_map[edge]][0]]
+                cost = network.get_path_cost(path, alpha, beta)
+            elif batched:
+                if batch[edge] is None:
+                    raise ValueError(f"No valid path of exactly {m} nodes from {edge} to {network.psa_upf}")
+                path, cost = batch[edge]
+            elif astar or delay_budget is not None or ue_demand is not None or prune:
+                path, cost = network.constrained_dijkstra(edge, network.psa_upf, m, alpha, beta, astar,
+                                                          delay_budget, demands.get(edge), prune)
+            else:
+                path, cost = network.route(edge, network.psa_upf, m, alpha, beta)
+            delay = network.path_delay(path)
+            if delay_budget is not None and delay > delay_budget:
+                raise ValueError(f"Path from {edge} takes {delay:.3f} ms, over the {delay_budget} ms budget")
+            if demands:
+                # Also rejects --optimize paths the links cannot carry
+                short = [(a, b) for a, b in zip(path, path[1:]) if network.residual_capacity(a, b) < demands[edge]]
+                if short:
+                    raise ValueError(f"Link {short[0][0]} -> {short[0][1]} cannot carry {demands[edge]:g} Mbps more")
+                network.reserve_path(path, demands[edge])
+            expanded = f", expanded: {network.expanded}" if astar else ""
+            if prune:
+                expanded += f", pre-pruned UPFs: {network.pruned}"
+            print(f"  ➤ {edge}: {' -> '.join(path)} (cost: {cost:.2f}, hops: {len(path)-1}, "
+                  f"delay: {delay:.3f} ms{expanded})")
             for upf in path[1:-1]:
                 network.upf_loads[upf] += 1
+            paths[edge] = {"path": path, "cost": cost, "delay_ms": delay}
+            if demands:
+                paths[edge]["demand_mbps"] = demands[edge]
+            if backup:
+                # Searched after the primary's loads are applied, as a failover would see them
+                spare = network.backup_path(path, alpha, beta, astar, delay_budget, demands.get(edge))
+                if spare is None:
+                    print("    ↳ no backup path avoiding its intermediate UPFs")
+                    paths[edge]["backup"] = None
+                else:
+                    shared = ", ".join(spare[2]) or "none"
+                    print(f"    ↳ backup: {' -> '.join(spare[0])} (cost: {spare[1]:.2f}, shared UPFs: {shared})")
+                    paths[edge]["backup"] = {"path": spare[0], "cost": spare[1], "shared": spare[2]}
         except ValueError as e:
             print(f"  ✖ {edge}: {e}")
+            paths[edge] = {"error": str(e)}
 
     print("\n📶 gNB to UE Assignments:")
     gnb_to_ues = defaultdict(list)
@@ -215,12 +201,128 @@ def assign_and_calculate(network, gnbs, num_ue, num_upfs, m, alpha=1.0, beta=0.5
     for gnb, ue_list in gnb_to_ues.items():
         print(f"  ➤ {gnb}: {ue_list}")
 
+    result = {
+        "assignments": gnb_assignments,
+        "renamed": rename_map,
+        "paths": paths,
+        "loads": dict(network.upf_loads),
+        "ues": dict(gnb_to_ues),
+    }
+    if hop_table:
+        result["hop_tables"] = hop_tables
+    return result
+
+
+def failover(paths, failed_upf):
+    """Backup paths replacing every planned path through `failed_upf`.
+
+    `paths` are the paths of an assign_and_calculate(backup=True) plan.
+    Returns {edge UPF: backup entry}, with None where the backup is missing
+    or also goes through `failed_upf`; no search is run.
+    """
+    swapped = {}
+    for edge, entry in paths.items():
+        if failed_upf not in entry.get("path", [])[1:-1]:
+            continue
+        spare = entry.get("backup")
+        swapped[edge] = spare if spare and failed_upf not in spare["path"] else None
+    return swapped
+
+
+def plan_options(args):
+    """assign_and_calculate() keyword options taken from the command line."""
+    return {"batched": args.batched, "optimize": args.optimize, "capacity": args.capacity,
+            "workers": args.workers, "astar": args.astar, "backup": args.backup,
+            "hop_table": args.hop_table, "prune": args.prune}
+
+
+def run_scenarios(paths, args):
+    """Plan every scenario in the given files and print one JSON report."""
+    defaults = {"m": args.m, "alpha": args.alpha, "beta": args.beta,
+                "k_nearest": args.knn, "radius": args.radius, "metric": args.metric,
+                "delay_budget": args.delay_budget, "ue_demand": args.ue_demand}
+    results = []
+    failed = False
+    for path in paths:
+        try:
+            scenarios = load_scenarios(path, defaults)
+        except (OSError, ImportError, ValueError, KeyError, TypeError) as e:
+            results.append({"file": path, "error": str(e)})
+            failed = True
+            continue
+        for scenario in scenarios:
+            result = {"file": path, "name": scenario["name"], "m": scenario["m"],
+                      "alpha": scenario["alpha"], "beta": scenario["beta"]}
+            try:
+                network = build_network(scenario)
+                if args.stats is not None:
+                    network.stats = SearchStats()
+                with redirect_stdout(io.StringIO()):
+                    plan = assign_and_calculate(network, scenario["gnbs"], scenario["num_ue"],
+                                                len(scenario["upfs"]), scenario["m"], scenario["alpha"],
+                                                scenario["beta"], delay_budget=scenario.get("delay_budget"),
+                                                ue_demand=scenario.get("ue_demand"), **plan_options(args))
+                result.update(plan)
+                if network.stats is not None:
+                    result["stats"] = network.stats.as_dict()
+                # An edge UPF without a path fails the scenario
+                if any("error" in path_result for path_result in plan["paths"].values()):
+                    failed = True
+            except (ValueError, KeyError) as e:
+                result["error"] = str(e)
+                failed = True
+            results.append(result)
+
+    report = json.dumps({"scenarios": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return not failed
+
 
 def main():
     parser = argparse.ArgumentParser(description="5G Network Path Calculator")
     parser.add_argument("--skip", action="store_true", help="Skip coordinate input and generate random network")
+    parser.add_argument("--batched", action="store_true", help="Route all edge UPFs in one search rooted at the PSA")
+    parser.add_argument("--astar", action="store_true", help="Route with the straight-line A* bound and report expanded labels")
+    parser.add_argument("--workers", type=int, help="Solve edge UPF paths in parallel on this many processes (implies --batched)")
+    parser.add_argument("--optimize", action="store_true", help="Assign gNBs and route edge UPFs jointly in one solve")
+    parser.add_argument("--capacity", type=int, help="Maximum load per UPF for --optimize")
+    parser.add_argument("--ue-demand", type=float, metavar="MBPS",
+                        help="Bandwidth per UE; paths only use links with that much capacity left under "
+                             "the tc shaping model, checked with max-flow first")
+    parser.add_argument("--backup", action="store_true",
+                        help="Also plan a failover path per edge UPF avoiding the intermediate UPFs of its path")
+    parser.add_argument("--fail", metavar="UPF",
+                        help="Show which planned paths switch to their backup if this UPF fails (implies --backup)")
+    parser.add_argument("--prune", action="store_true",
+                        help="Drop UPFs outside the ellipse bound of a greedy first path before each search")
+    parser.add_argument("--hop-table", type=int, metavar="MAX",
+                        help="Print the best path cost per edge UPF for every m up to MAX, found in one pass")
+    parser.add_argument("--delay-budget", type=float, metavar="MS",
+                        help="Only accept edge UPF to PSA paths within this one-way delay (ms)")
+    parser.add_argument("--scenario", nargs="+", metavar="FILE",
+                        help="Plan scenarios from JSON/YAML/CSV files without prompting and print JSON results")
+    parser.add_argument("--output", help="Write --scenario results to this file instead of stdout")
+    parser.add_argument("--m", type=int, help="Default m for --scenario files")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Default alpha for --scenario files")
+    parser.add_argument("--beta", type=float, default=0.5, help="Default beta for --scenario files")
+    parser.add_argument("--knn", type=int, help="Connect each UPF to its k nearest UPFs instead of a full mesh")
+    parser.add_argument("--radius", type=float, help="Connect UPFs closer than this distance instead of a full mesh")
+    parser.add_argument("--metric", choices=UPFNetwork.METRICS, default="planar",
+                        help="Distance between coordinates: planar x/y, or haversine km over latitude/longitude")
+    parser.add_argument("--stats", nargs="?", const="-", metavar="FILE",
+                        help="Count heap pushes/pops, pruning and time per path search; print a summary "
+                             "and write every search to FILE as JSON (added to --scenario results)")
+    parser.add_argument("--save-network", metavar="FILE",
+                        help="Write the planned network (positions, matrix, loads, edge UPFs, names) to an .npz snapshot")
     args = parser.parse_args()
 
+    if args.scenario:
+        sys.exit(0 if run_scenarios(args.scenario, args) else 1)
+
     print("📡 5G Network Path Calculation with PSA")
     print("======================================\n")
 
@@ -228,12 +330,43 @@ def main():
     num_upfs = int(input("🔢 Enter number of UPFs (n): "))
     m = int(input("🔗 Enter number of UPFs each UE passes by (m): "))
 
-    network, gnbs, max_e = generate_network(num_ue, num_upfs, m, args.skip)
+    network, gnbs, max_e = generate_network(num_ue, num_upfs, m, args.skip, args.knn, args.radius, args.metric)
 
     alpha = 1.0
     beta = 0.5
 
-    assign_and_calculate(network, gnbs, num_ue, num_upfs, m, alpha, beta)
+    if args.stats is not None:
+        network.stats = SearchStats()
+    options = plan_options(args)
+    options["backup"] = args.backup or bool(args.fail)
+    try:
+        plan = assign_and_calculate(network, gnbs, num_ue, num_upfs, m, alpha, beta, delay_budget=args.delay_budget,
+                                    ue_demand=args.ue_demand, **options)
+    except ValueError as e:
+        # e.g. no joint assignment satisfies --capacity
+        print(f"\n✖ {e}")
+        sys.exit(1)
+
+    if args.fail:
+        print(f"\n🔁 Failover if {args.fail} fails:")
+        swapped = failover(plan["paths"], args.fail)
+        if not swapped:
+            print("  ➤ No planned path goes through it")
+        for edge, spare in swapped.items():
+            if spare is None:
+                print(f"  ✖ {edge}: no backup avoiding {args.fail}, replan needed")
+            else:
+                print(f"  ➤ {edge}: {' -> '.join(spare['path'])} (cost: {spare['cost']:.2f})")
+
+    if network.stats is not None:
+        print(f"\n🔍 Search stats: {network.stats.summary()}")
+        if args.stats != "-":
+            network.stats.to_json(args.stats)
+            print(f"💾 Search stats written to {args.stats}")
+
+    if args.save_network:
+        network.save(args.save_network)
+        print(f"\n💾 Network snapshot written to {args.save_network}")
 
 
 if __name__ == "__main__":
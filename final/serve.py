@@ -0,0 +1,321 @@
+"""Long-running path-planning daemon answering JSON requests over localhost HTTP.
+
+One UPFNetwork stays in memory with its distance matrix, KD-tree, loads
+and result cache warm, so a request costs a search instead of a process
+start and a network build. A single worker thread owns the network and
+answers requests in batches: whatever is queued when it wakes up is taken
+at once, and plain route requests in a batch that share their end, m,
+alpha and beta are solved by one constrained_paths_to() search.
+
+    python serve.py --load-network plan.npz --m 3 --port 8750
+    curl -s localhost:8750/route -d '{"start": "upf3", "m": 4}'
+
+Endpoints, all JSON:
+    POST /route   {"start", "end", "m", "alpha", "beta", "astar", "delay_budget", "demand"}
+                  path from start (default end: the PSA); loads are not changed and
+                  demand (Mbps) is checked against the tc link capacity model
+    POST /assign  {"position": [x, y], "alpha", "beta"} edge UPF a gNB there would use
+    POST /attach  {"ue", "gnb", "position"} attach a UE as simulate.py does; the gNB
+                  position is needed the first time a gNB is seen
+    POST /detach  {"ue"} detach a UE, releasing its path with the last UE of its edge UPF
+    GET  /metrics request counts, batching, latency percentiles, sessions and cache
+"""
+import json
+import time
+import queue
+import random
+import argparse
+import threading
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from simulate import Simulator, snapshot_gnbs
+from sweep import sample_upfs
+from utils.distance import link_bandwidth
+from utils.upf_network import UPFNetwork
+
+ENDPOINTS = ("route", "assign", "attach", "detach")
+MAX_BATCH = 256
+
+
+class RequestError(Exception):
+    """A rejected request and the HTTP status to answer it with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Planner:
+    """Owns the network; only its worker thread reads or changes it.
+
+    submit() queues a request from any thread and waits for the answer.
+    """
+
+    def __init__(self, network, gnbs, m, alpha=1.0, beta=0.5, astar=False):
+        self.network = network
+        # Route demands are checked against the capacities apply_distance() shapes links to
+        if network.capacity_model is None:
+            network.capacity_model = link_bandwidth
+        self.simulator = Simulator(network, gnbs, m, alpha, beta, astar, record=False)
+        self.m = m
+        self.alpha = alpha
+        self.beta = beta
+        self.queue = queue.Queue()
+        self.started = time.monotonic()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.batches = 0
+        self.shared_routes = 0
+        # Seconds from submit() to the answer, for the latest requests
+        self.latencies = deque(maxlen=10000)
+        self._solved = {}
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    def submit(self, kind, body):
+        """Queue a request and block until it is answered; returns (status, response)."""
+        item = [kind, body, time.perf_counter(), threading.Event(), None]
+        self.queue.put(item)
+        item[3].wait()
+        return item[4]
+
+    def _work(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.batches += 1
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Never leave a client waiting on an item the batch did not get to
+                for item in batch:
+                    if not item[3].is_set():
+                        item[4] = 500, {"error": f"Internal error: {e!r}"}
+                        self.errors[item[0]] += 1
+                        item[3].set()
+
+    def _run_batch(self, batch):
+        i = 0
+        while i < len(batch):
+            # Consecutive route requests see the same loads, so they can share searches
+            j = i
+            while j < len(batch) and batch[j][0] == "route":
+                j += 1
+            j = max(j, i + 1)
+            try:
+                self._solved = self._solve_routes(batch[i:j]) if j - i > 1 else {}
+            except Exception:
+                # Each request then runs its own search and reports its own error
+                self._solved = {}
+            for item in batch[i:j]:
+                self._answer(item)
+            i = j
+
+    def _answer(self, item):
+        kind, body = item[:2]
+        self.requests[kind] += 1
+        try:
+            if not isinstance(body, dict):
+                raise RequestError(400, "Request body must be a JSON object")
+            item[4] = 200, getattr(self, kind)(body)
+        except RequestError as e:
+            item[4] = e.status, {"error": str(e)}
+        except KeyError as e:
+            item[4] = 404, {"error": f"Unknown UPF or UE: {e.args[0]}"}
+        except (ValueError, TypeError) as e:
+            item[4] = 422, {"error": str(e)}
+        except Exception as e:
+            item[4] = 500, {"error": f"Internal error: {e!r}"}
+        if item[4][0] != 200:
+            self.errors[kind] += 1
+        self.latencies.append(time.perf_counter() - item[2])
+        item[3].set()
+
+    def _route_args(self, body):
+        if "start" not in body:
+            raise RequestError(400, "route needs a start UPF")
+        start, end = body["start"], body.get("end", self.network.psa_upf)
+        if not isinstance(start, str) or not isinstance(end, str):
+            raise RequestError(400, "start and end must be UPF names")
+        m = int(body.get("m", self.m))
+        # A simple path visits each UPF at most once
+        if not 2 <= m <= len(self.network.names):
+            raise RequestError(422, f"m must be between 2 and {len(self.network.names)}")
+        delay_budget, demand = body.get("delay_budget"), body.get("demand")
+        return (start, end, m, float(body.get("alpha", self.alpha)), float(body.get("beta", self.beta)),
+                bool(body.get("astar", False)), None if delay_budget is None else float(delay_budget),
+                None if demand is None else float(demand))
+
+    def _solve_routes(self, items):
+        """Solve plain route requests grouped by (end, m, alpha, beta) with one search per group."""
+        groups = {}
+        for item in items:
+            try:
+                start, end, m, alpha, beta, astar, delay_budget, demand = self._route_args(item[1])
+            except (RequestError, ValueError, TypeError, AttributeError):
+                continue
+            if not astar and delay_budget is None and demand is None and end in self.network.ids:
+                groups.setdefault((end, m, alpha, beta), set()).add(start)
+        solved = {}
+        for (end, m, alpha, beta), starts in groups.items():
+            if len(starts) > 1:
+                for start, result in self.network.constrained_paths_to(end, starts, m, alpha, beta).items():
+                    solved[start, end, m, alpha, beta] = result
+        return solved
+
+    def route(self, body):
+        start, end, m, alpha, beta, astar, delay_budget, demand = self._route_args(body)
+        key = start, end, m, alpha, beta
+        if key in self._solved and not astar and delay_budget is None and demand is None:
+            self.shared_routes += 1
+            if self._solved[key] is None:
+                raise ValueError(f"No valid path of exactly {m} nodes from {start} to {end}")
+            path, cost = self._solved[key]
+        else:
+            path, cost = self.network.constrained_dijkstra(start, end, m, alpha, beta, astar, delay_budget, demand)
+        return {"path": path, "cost": cost, "delay_ms": self.network.path_delay(path)}
+
+    def assign(self, body):
+        if "position" not in body:
+            raise RequestError(400, "assign needs a position")
+        x, y = body["position"]
+        # UPFs relaying attached UEs' paths are not offered, as in attach
+        edge = self.network.select_edge_upf((float(x), float(y)), float(body.get("alpha", self.alpha)),
+                                            float(body.get("beta", self.beta)), exclude=self.simulator.transit > 0)
+        if edge is None:
+            raise RequestError(422, "Every UPF relays an attached UE's path")
+        return {"edge": edge}
+
+    def attach(self, body):
+        simulator = self.simulator
+        ue, gnb = body.get("ue"), body.get("gnb")
+        if not isinstance(ue, str) or not isinstance(gnb, str):
+            raise RequestError(400, "attach needs a ue and a gnb name")
+        if ue in simulator.sessions:
+            raise RequestError(409, f"{ue} is already attached")
+        if "position" in body:
+            x, y = body["position"]
+            simulator.gnbs[gnb] = float(x), float(y)
+        elif gnb not in simulator.gnbs:
+            raise RequestError(404, f"Unknown gNB {gnb}; send its position")
+        if not simulator.attach(ue, gnb, time.monotonic() - self.started):
+            raise RequestError(422, f"No path of exactly {self.m} nodes for {ue}; not admitted")
+        edge = simulator.sessions[ue][1]
+        return {"edge": edge, "path": simulator.edge_paths[edge]}
+
+    def detach(self, body):
+        ue = body.get("ue")
+        if not isinstance(ue, str):
+            raise RequestError(400, "detach needs a ue name")
+        if ue not in self.simulator.sessions:
+            raise RequestError(404, f"{ue} is not attached")
+        edge = self.simulator.sessions[ue][1]
+        self.simulator.detach(ue, time.monotonic() - self.started)
+        return {"edge": edge, "released": edge not in self.simulator.edge_paths}
+
+    def metrics(self, body):
+        network = self.network
+        latencies = np.array(self.latencies) * 1000
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+        served = sum(self.requests.values())
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "batches": self.batches,
+            "mean_batch": served / self.batches if self.batches else 0.0,
+            "shared_routes": self.shared_routes,
+            "latency_ms": {"p50": p50, "p99": p99, "max": latencies.max(initial=0.0)},
+            "active_ues": len(self.simulator.sessions),
+            "edge_upfs": len(self.simulator.edge_paths),
+            "upfs": len(network.names),
+            "max_load": max(network.loads),
+            "cache": network.cache_info(),
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; do not let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+        self._send(*self.server.planner.submit("metrics", {}))
+
+    def do_POST(self):
+        kind = self.path.strip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length)
+        if kind not in ENDPOINTS:
+            return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+        try:
+            body = json.loads(data) if data else {}
+        except ValueError:
+            return self._send(400, {"error": "Request body is not valid JSON"})
+        self._send(*self.server.planner.submit(kind, body))
+
+    def _send(self, status, response):
+        payload = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PlannerServer(ThreadingHTTPServer):
+    # Room for a burst of orchestration clients connecting at once
+    request_queue_size = 128
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Path-planning daemon with a warm in-memory UPF network")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--load-network", metavar="FILE", help="Serve a saved .npz snapshot")
+    parser.add_argument("--upfs", type=int, default=20, help="UPFs in the random network without --load-network")
+    parser.add_argument("--gnbs", type=int, default=10, help="gNBs known up front, named gnb1..N")
+    parser.add_argument("--knn", type=int, help="Connect each UPF to its k nearest UPFs instead of a full mesh")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--m", type=int, default=3, help="Default m for routes and the m used by attach")
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--beta", type=float, default=0.5)
+    parser.add_argument("--astar", action="store_true", help="Route attaches with the straight-line A* bound")
+    parser.add_argument("--verbose", action="store_true", help="Log every HTTP request")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.load_network:
+        network = UPFNetwork.load(args.load_network)
+    else:
+        network = sample_upfs(args.upfs, rng, args.knn)
+    gnbs = snapshot_gnbs(network, args.gnbs, rng)
+
+    server = PlannerServer((args.host, args.port), Handler)
+    server.planner = Planner(network, gnbs, args.m, args.alpha, args.beta, args.astar)
+    server.verbose = args.verbose
+    print(f"🚀 Planning daemon on http://{args.host}:{server.server_port} "
+          f"({len(network.names)} UPFs, PSA {network.psa_upf}, m={args.m})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Daemon stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Monte Carlo sweep of the planner over random topologies.
+
+For every (num_ue, num_upfs, m, alpha, beta) grid point, plans N seeded
+random networks laid out like interface.py --skip, on a process pool, and
+writes one row of aggregated statistics per grid point: path cost
+distribution, infeasibility rate and maximum UPF load. The output is
+columnar: one array per column in a .npz file, or a .csv.
+
+    python sweep.py --num-ue 10 40 --num-upfs 10 50 --m 3 4 --samples 1000 -o sweep.npz
+"""
+import io
+import os
+import csv
+import time
+import random
+import argparse
+import itertools
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from interface import assign_and_calculate
+from utils.upf_network import UPFNetwork
+
+COLUMNS = ["num_ue", "num_upfs", "m", "alpha", "beta", "samples", "edges", "infeasible_rate",
+           "cost_mean", "cost_p05", "cost_p50", "cost_p95", "cost_max",
+           "max_load_mean", "max_load_max", "solve_s"]
+
+
+def sample_upfs(num_upfs, rng, k_nearest=None):
+    """Random UPFs and PSA over a 10x10 area, fully connected or to their k nearest UPFs."""
+    network = UPFNetwork()
+    for i in range(1, num_upfs + 1):
+        network.add_upf(f"upf{i}", (rng.uniform(0, 10), rng.uniform(0, 10)))
+    network.set_psa((rng.uniform(0, 10), rng.uniform(0, 10)))
+    if k_nearest:
+        network.connect_nearest(k_nearest)
+    else:
+        network.connect_all()
+    return network
+
+
+def sample_network(num_ue, num_upfs, rng):
+    """Random network and gNBs as generate_network(skip=True) builds them."""
+    gnbs = {f"gnb{i}": (0.0, float(i)) for i in range(1, num_ue // 2 + 1)}
+    return sample_upfs(num_upfs, rng), gnbs
+
+
+def run_samples(task):
+    """Plan one chunk of samples; returns (costs, failed edges, edges, max loads, seconds)."""
+    point, seed, samples, batched = task
+    num_ue, num_upfs, m, alpha, beta = point
+    start = time.perf_counter()
+    costs, max_loads = [], []
+    failed = edges = 0
+    for sample in samples:
+        rng = random.Random(f"{seed}-{point}-{sample}")
+        network, gnbs = sample_network(num_ue, num_upfs, rng)
+        with redirect_stdout(io.StringIO()):
+            plan = assign_and_calculate(network, gnbs, num_ue, num_upfs, m, alpha, beta, batched=batched)
+        for result in plan["paths"].values():
+            edges += 1
+            if "cost" in result:
+                costs.append(result["cost"])
+            else:
+                failed += 1
+        max_loads.append(max(plan["loads"].values()))
+    return costs, failed, edges, max_loads, time.perf_counter() - start
+
+
+def aggregate(point, chunks):
+    costs = np.array([c for chunk in chunks for c in chunk[0]], dtype=np.float64)
+    failed = sum(chunk[1] for chunk in chunks)
+    edges = sum(chunk[2] for chunk in chunks)
+    max_loads = np.array([load for chunk in chunks for load in chunk[3]], dtype=np.float64)
+    p05, p50, p95 = np.percentile(costs, [5, 50, 95]) if len(costs) else (np.nan,) * 3
+    return dict(zip(COLUMNS, [
+        *point, len(max_loads), edges, failed / edges if edges else np.nan,
+        costs.mean() if len(costs) else np.nan, p05, p50, p95, costs.max() if len(costs) else np.nan,
+        max_loads.mean(), max_loads.max(), sum(chunk[4] for chunk in chunks),
+    ]))
+
+
+def write_columns(rows, path, columns=COLUMNS):
+    """Write dict rows as a .csv, or as a .npz with one array per column."""
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        np.savez(path, **{column: np.array([row[column] for row in rows]) for column in columns})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo sweep over random UPF topologies")
+    parser.add_argument("--num-ue", type=int, nargs="+", default=[10])
+    parser.add_argument("--num-upfs", type=int, nargs="+", default=[10])
+    parser.add_argument("--m", type=int, nargs="+", default=[3])
+    parser.add_argument("--alpha", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--beta", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--samples", type=int, default=100, help="Random topologies per grid point")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk", type=int, default=50, help="Samples per pool task")
+    parser.add_argument("--batched", action="store_true", help="Route all edge UPFs in one search rooted at the PSA")
+    parser.add_argument("-o", "--output", default="sweep.npz", help=".npz (one array per column) or .csv")
+    args = parser.parse_args()
+
+    grid = [point for point in itertools.product(args.num_ue, args.num_upfs, args.m, args.alpha, args.beta)
+            if point[2] <= point[1] + 1]
+    # Every chunk of every grid point goes to the pool at once
+    tasks = [(point, args.seed, range(i, min(i + args.chunk, args.samples)), args.batched)
+             for point in grid for i in range(0, args.samples, args.chunk)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        results = list(pool.map(run_samples, tasks))
+
+    rows = []
+    for point in grid:
+        row = aggregate(point, [result for task, result in zip(tasks, results) if task[0] == point])
+        rows.append(row)
+        print(f"📈 ue={row['num_ue']} upfs={row['num_upfs']} m={row['m']} alpha={row['alpha']} "
+              f"beta={row['beta']}: cost p50={row['cost_p50']:.2f} p95={row['cost_p95']:.2f}, "
+              f"infeasible={row['infeasible_rate']:.1%}, max load={row['max_load_max']:.0f}")
+
+    write_columns(rows, args.output)
+    print(f"\n💾 {len(rows)} grid points written to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,9 @@ import logging
 import time
 import os
 import re
-from math import radians, sin, cos, sqrt, atan2
 import docker
+
+from utils.geodesic import haversine
 # made by hennane douaa el ikhlas and Maha remil
 # Configure logging
 logging.basicConfig(
@@ -13,14 +14,6 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate distance between two GPS points (in km)"""
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    return 6371 * 2 * atan2(sqrt(a), sqrt(1-a))
-
 def calculate_bandwidth(distance_km):
     """Calculate bandwidth based on distance with fiber attenuation model"""
     L0 = 0.2  # Initial signal loss at 1 km (in dB)
@@ -205,9 +198,10 @@ def apply_distance(coordinates):
         i_upf_lat, i_upf_lon = coordinates['i_upf']
         psa_upf_lat, psa_upf_lon = coordinates['psa_upf']
         
-        # Calculate distances
-        distance_ue_upfi = haversine(ueransim_lat, ueransim_lon, i_upf_lat, i_upf_lon)
-        distance_upfi_psa = haversine(i_upf_lat, i_upf_lon, psa_upf_lat, psa_upf_lon)
+        # Calculate distances (both legs in one call)
+        distance_ue_upfi, distance_upfi_psa = haversine(
+            [ueransim_lat, i_upf_lat], [ueransim_lon, i_upf_lon],
+            [i_upf_lat, psa_upf_lat], [i_upf_lon, psa_upf_lon]).tolist()
         
         # Calculate bandwidths
         bw_ue_upfi = calculate_bandwidth(distance_ue_upfi)
@@ -2,7 +2,10 @@
 import sys
 import logging
 import time
-from math import radians, sin, cos, sqrt, atan2
+
+import numpy as np
+
+from utils.geodesic import haversine
 
 # Configure logging
 logging.basicConfig(
@@ -10,12 +13,9 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def haversine(lat1, lon1, lat2, lon2):
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    return 6371 * 2 * atan2(sqrt(a), sqrt(1 - a))
+def link_bandwidth(distance_km, original_bw=1000, attenuation_db_per_km=0.02, min_bandwidth=100):
+    """Bandwidth (Mbps) apply_distance() shapes a link of this length to; works on arrays."""
+    return np.maximum(original_bw * 10 ** (-attenuation_db_per_km * np.asarray(distance_km) / 10), min_bandwidth)
 
 def get_network_interface(container, target_ip=None):
     try:
@@ -147,18 +147,19 @@ def apply_distance(upf_coords, attenuation_db_per_km=0.02, min_bandwidth=100):
                 "original_bw": original_bw
             }
 
-        def haversine_km(a, b):
-            return haversine(*a["coords"], *b["coords"])
+        # Every link length in one vectorized call
+        first = np.array([upfs[a]["coords"] for a, _ in links], dtype=np.float64).reshape(-1, 2)
+        second = np.array([upfs[b]["coords"] for _, b in links], dtype=np.float64).reshape(-1, 2)
+        link_km = haversine(first[:, 0], first[:, 1], second[:, 0], second[:, 1]).tolist()
 
         def calculate_bw(distance_km, original_bw):
-            return max(original_bw * (10 ** (-attenuation_db_per_km * distance_km / 10)), min_bandwidth)
+            return float(link_bandwidth(distance_km, original_bw, attenuation_db_per_km, min_bandwidth))
 
-        for upf1_name, upf2_name in links:
+        for (upf1_name, upf2_name), distance_km in zip(links, link_km):
             try:
                 upf1 = upfs[upf1_name]
                 upf2 = upfs[upf2_name]
 
-                distance_km = haversine_km(upf1, upf2)
                 bw1 = calculate_bw(distance_km, upf1["original_bw"])
                 bw2 = calculate_bw(distance_km, upf2["original_bw"])
 
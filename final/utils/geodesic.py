@@ -0,0 +1,123 @@
+"""Great-circle distances between (latitude, longitude) points, in km.
+
+Every function takes NumPy arrays (or scalars) and broadcasts, so one call
+covers a whole row of a distance matrix. Spherical haversine is the default;
+ellipsoidal=True switches to Vincenty's formula on the WGS-84 ellipsoid.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# WGS-84 semi-major axis (km) and flattening
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def _radians(*values):
+    return np.broadcast_arrays(*(np.radians(np.asarray(v, dtype=np.float64)) for v in values))
+
+
+def _result(distance):
+    return float(distance) if np.ndim(distance) == 0 else distance
+
+
+def haversine(lat1, lon1, lat2, lon2, ellipsoidal=False):
+    """Distance between GPS points (in km); arrays broadcast elementwise."""
+    if ellipsoidal:
+        return vincenty(lat1, lon1, lat2, lon2)
+    lat1, lon1, lat2, lon2 = _radians(lat1, lon1, lat2, lon2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return _result(EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+
+
+def vincenty(lat1, lon1, lat2, lon2, iterations=200, tolerance=1e-12):
+    """WGS-84 ellipsoidal distance (in km); arrays broadcast elementwise.
+
+    Nearly antipodal pairs where the iteration does not converge fall back
+    to haversine.
+    """
+    phi1, lambda1, phi2, lambda2 = _radians(lat1, lon1, lat2, lon2)
+    u1 = np.arctan((1 - WGS84_F) * np.tan(phi1))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(phi2))
+    sin_u1, cos_u1, sin_u2, cos_u2 = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+    lon_diff = lambda2 - lambda1
+
+    lam = lon_diff
+    for _ in range(iterations):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        sin_alpha = cos_u1 * cos_u2 * sin_lam / np.where(sin_sigma == 0, 1, sin_sigma)
+        cos2_alpha = 1 - sin_alpha ** 2
+        # Both points on the equator: cos2_alpha is 0 and so is this term
+        cos_2sm = np.where(cos2_alpha == 0, 0,
+                           cos_sigma - 2 * sin_u1 * sin_u2 / np.where(cos2_alpha == 0, 1, cos2_alpha))
+        c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+        previous = lam
+        lam = lon_diff + (1 - c) * WGS84_F * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sm + c * cos_sigma * (2 * cos_2sm ** 2 - 1)))
+        converged = np.abs(lam - previous) < tolerance
+        if converged.all():
+            break
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (cos_2sm + b / 4 * (
+        cos_sigma * (2 * cos_2sm ** 2 - 1)
+        - b / 6 * cos_2sm * (4 * sin_sigma ** 2 - 3) * (4 * cos_2sm ** 2 - 3)))
+    distance = np.where(sin_sigma == 0, 0, WGS84_B * a * (sigma - delta_sigma))
+    if not converged.all():
+        distance = np.where(converged, distance, haversine(lat1, lon1, lat2, lon2))
+    return _result(distance)
+
+
+def one_to_many(point, points, ellipsoidal=False):
+    """Distances (in km) from one (lat, lon) point to an (n, 2) array of them."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return haversine(point[0], point[1], points[:, 0], points[:, 1], ellipsoidal)
+
+
+def pairwise(points, ellipsoidal=False):
+    """Pairwise distances (in km) as a float32 condensed matrix.
+
+    Same row-major upper triangle layout as upf_network.condensed_distances.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    distances = np.empty(n * (n - 1) // 2, dtype=np.float32)
+    offset = 0
+    for i in range(n - 1):
+        distances[offset:offset + n - i - 1] = one_to_many(points[i], points[i+1:], ellipsoidal)
+        offset += n - i - 1
+    return distances
+
+
+@lru_cache(maxsize=1 << 16)
+def _pair(p, q, ellipsoidal):
+    return haversine(p[0], p[1], q[0], q[1], ellipsoidal)
+
+
+def pair_distance(p, q, ellipsoidal=False):
+    """Distance (in km) between two (lat, lon) points, memoized per unordered pair."""
+    p, q = (float(p[0]), float(p[1])), (float(q[0]), float(q[1]))
+    return _pair(min(p, q), max(p, q), ellipsoidal)
+
+
+def to_unit_vectors(points):
+    """(lat, lon) points as 3D unit vectors, whose chord distances order like great circles."""
+    lat, lon = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2)).T
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+
+
+def chord_to_km(chord):
+    """Great-circle distance (in km) behind a unit-sphere chord length."""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord, dtype=np.float64) / 2, 1))
+
+
+def km_to_chord(distance):
+    """Unit-sphere chord length of a great-circle distance (in km)."""
+    return 2 * np.sin(np.minimum(np.asarray(distance, dtype=np.float64) / (2 * EARTH_RADIUS_KM), np.pi / 2))
@@ -0,0 +1,124 @@
+from itertools import islice
+
+import numpy as np
+
+
+def optimize_assignment(network, gnbs, m, alpha=1.0, beta=0.5, capacity=None,
+                        candidates=4, paths_per_edge=4, balance=None, unrouted_cost=None,
+                        time_limit=60):
+    """Assign every gNB to an edge UPF and route every edge UPF in one solve.
+
+    Mixed-integer program over candidate options solved with scipy's HiGHS:
+    each gNB picks one of its `candidates` nearest UPFs, and each chosen edge
+    UPF one of its `paths_per_edge` best m-UPF paths to the PSA. Loads count
+    like the greedy planner (+1 per gNB on its edge UPF, +1 per routed edge on
+    every intermediate UPF) on top of the current loads. Every UPF load stays
+    within `capacity` (an int, or a dict by UPF name) and a UPF chosen as edge
+    is never an intermediate. The objective is the attachment cost
+    alpha*distance + beta*load plus the path costs, plus `balance` (default
+    beta) times the highest resulting UPF load. Like the greedy planner, an
+    edge UPF may be left without a path, at `unrouted_cost` (default ten times
+    the dearest candidate path).
+
+    HiGHS stops after `time_limit` seconds with the best plan found so far.
+    The network is not modified. Returns ({gnb: edge upf}, {edge upf: (path,
+    cost)}) where unrouted edge UPFs have no entry; raises ValueError when no
+    plan satisfies the capacities.
+    """
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import coo_matrix
+
+    balance = beta if balance is None else balance
+    psa = network.psa_upf
+
+    # Candidate edge UPFs per gNB and candidate paths per edge UPF. Paths may
+    # cross any other UPF here; the edge exclusion is a constraint below.
+    options = [(gnb, [upf for upf, _ in network.nearest_upfs(pos, candidates)])
+               for gnb, pos in gnbs.items()]
+    if any(not edges for _, edges in options):
+        raise ValueError("No UPF available to serve as edge UPF")
+    edges = sorted({upf for _, upf_list in options for upf in upf_list}, key=network.ids.get)
+    saved_edges = network.edge_ids
+    network.edge_ids = set()
+    try:
+        paths = {edge: list(islice(network.k_best_paths(edge, psa, m, paths_per_edge, alpha, beta),
+                                   paths_per_edge))
+                 for edge in edges}
+    finally:
+        network.edge_ids = saved_edges
+
+    # Variables: x[gnb, edge], y[edge, path], s[edge] (edge in use),
+    # u[edge] (edge left unrouted), w (max load)
+    x = [(gnb, edge) for gnb, upf_list in options for edge in upf_list]
+    y = [(edge, k) for edge in edges for k in range(len(paths[edge]))]
+    x_col = {key: i for i, key in enumerate(x)}
+    y_col = {key: len(x) + i for i, key in enumerate(y)}
+    s_col = {edge: len(x) + len(y) + i for i, edge in enumerate(edges)}
+    u_col = {edge: len(x) + len(y) + len(edges) + i for i, edge in enumerate(edges)}
+    w_col = len(x) + len(y) + 2 * len(edges)
+    n_vars = w_col + 1
+
+    cost = np.zeros(n_vars)
+    for (gnb, edge), col in x_col.items():
+        cost[col] = alpha * network.point_distance(gnbs[gnb], network.upf_positions[edge]) + beta * network.upf_loads[edge]
+    for (edge, k), col in y_col.items():
+        cost[col] = paths[edge][k][1]
+    if unrouted_cost is None:
+        unrouted_cost = 10 * max((cost[col] for col in y_col.values()), default=100)
+    for col in u_col.values():
+        cost[col] = unrouted_cost
+    cost[w_col] = balance
+
+    rows, cols, values, lower, upper = [], [], [], [], []
+
+    def constrain(terms, lo, hi):
+        row = len(lower)
+        for col, value in terms:
+            rows.append(row)
+            cols.append(col)
+            values.append(value)
+        lower.append(lo)
+        upper.append(hi)
+
+    for gnb, upf_list in options:
+        constrain([(x_col[gnb, edge], 1) for edge in upf_list], 1, 1)
+    for (gnb, edge), col in x_col.items():
+        path_terms = [(y_col[edge, k], -1) for k in range(len(paths[edge]))]
+        constrain([(col, 1), (u_col[edge], -1)] + path_terms, -np.inf, 0)
+        constrain([(col, 1), (s_col[edge], -1)], -np.inf, 0)
+    for edge in edges:
+        constrain([(y_col[edge, k], 1) for k in range(len(paths[edge]))], -np.inf, 1)
+
+    # Load terms per UPF: gNBs attached to it plus routed paths crossing it
+    load_terms = {}
+    for (gnb, edge), col in x_col.items():
+        load_terms.setdefault(edge, []).append((col, 1))
+    for (edge, k), col in y_col.items():
+        for upf in paths[edge][k][0][1:-1]:
+            load_terms.setdefault(upf, []).append((col, 1))
+            if upf in s_col:
+                constrain([(col, 1), (s_col[upf], 1)], -np.inf, 1)
+    for upf, terms in load_terms.items():
+        base = network.upf_loads[upf]
+        limit = capacity.get(upf, np.inf) if isinstance(capacity, dict) else capacity
+        constrain(terms, -np.inf, np.inf if limit is None else limit - base)
+        constrain(terms + [(w_col, -1)], -np.inf, -base)
+
+    matrix = coo_matrix((values, (rows, cols)), shape=(len(lower), n_vars)).tocsr()
+    integrality = np.ones(n_vars)
+    integrality[w_col] = 0
+    lower_bounds = np.zeros(n_vars)
+    lower_bounds[w_col] = max((network.upf_loads[upf] for upf in network.upf_positions if upf != psa), default=0)
+    upper_bounds = np.ones(n_vars)
+    upper_bounds[w_col] = np.inf
+
+    result = milp(cost, integrality=integrality, bounds=Bounds(lower_bounds, upper_bounds),
+                  constraints=LinearConstraint(matrix, lower, upper),
+                  options={"time_limit": time_limit})
+    if result.x is None:
+        raise ValueError(f"No joint assignment satisfies the constraints: {result.message}")
+
+    chosen = result.x > 0.5
+    assignments = {gnb: edge for (gnb, edge), col in x_col.items() if chosen[col]}
+    routes = {edge: paths[edge][k] for (edge, k), col in y_col.items() if chosen[col]}
+    return assignments, routes
@@ -0,0 +1,92 @@
+import os
+import csv
+import json
+
+from utils.upf_network import UPFNetwork
+
+
+def _point(value):
+    if isinstance(value, dict):
+        return (float(value["x"]), float(value["y"]))
+    x, y = value
+    return (float(x), float(y))
+
+
+def _named_points(values, prefix):
+    """Coordinates given as a list (named prefix1, prefix2, ...) or a name -> point map."""
+    if isinstance(values, dict):
+        return {str(name): _point(pos) for name, pos in values.items()}
+    return {f"{prefix}{i}": _point(pos) for i, pos in enumerate(values, 1)}
+
+
+def _from_csv(path):
+    """Rows of scenario,type,id,x,y where type is gnb, upf or psa."""
+    scenarios = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            name = row.get("scenario") or os.path.splitext(os.path.basename(path))[0]
+            scenario = scenarios.setdefault(name, {"name": name, "gnbs": {}, "upfs": {}})
+            kind = row["type"].strip().lower()
+            pos = (float(row["x"]), float(row["y"]))
+            if kind == "psa":
+                scenario["psa"] = pos
+            elif kind in ("gnb", "upf"):
+                scenario[kind + "s"][row.get("id") or f"{kind}{len(scenario[kind + 's']) + 1}"] = pos
+            else:
+                raise ValueError(f"Unknown row type {row['type']!r} in {path}")
+    return list(scenarios.values())
+
+
+def load_scenarios(path, defaults=None):
+    """Planning scenarios from a JSON, YAML or CSV file.
+
+    JSON/YAML hold one scenario, a list of them, or {"scenarios": [...]}.
+    A scenario has gnbs, upfs and psa coordinates and optionally name, m,
+    alpha, beta, num_ue, k_nearest, radius, metric, delay_budget and
+    ue_demand; missing
+    settings come from `defaults`. CSV files only carry coordinates, so m,
+    alpha and beta always come from `defaults` there.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        raw = _from_csv(path)
+    else:
+        with open(path) as f:
+            if ext in (".yaml", ".yml"):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError(f"Reading {path} needs PyYAML: pip install pyyaml") from None
+                raw = yaml.safe_load(f)
+            else:
+                raw = json.load(f)
+        if isinstance(raw, dict):
+            raw = raw.get("scenarios", [raw])
+
+    base = os.path.splitext(os.path.basename(path))[0]
+    scenarios = []
+    for i, entry in enumerate(raw, 1):
+        scenario = dict(defaults or {})
+        scenario.update({k: v for k, v in entry.items() if v is not None})
+        scenario.setdefault("name", f"{base}-{i}" if len(raw) > 1 else base)
+        scenario["gnbs"] = _named_points(entry["gnbs"], "gnb")
+        scenario["upfs"] = _named_points(entry["upfs"], "upf")
+        scenario["psa"] = _point(entry["psa"])
+        scenario.setdefault("num_ue", 2 * len(scenario["gnbs"]))
+        if scenario.get("m") is None:
+            raise ValueError(f"Scenario {scenario['name']} has no m")
+        scenarios.append(scenario)
+    return scenarios
+
+
+def build_network(scenario):
+    """UPFNetwork for a scenario, as a full mesh unless k_nearest/radius is set."""
+    network = UPFNetwork(scenario.get("metric") or "planar")
+    for upf_id, pos in scenario["upfs"].items():
+        network.add_upf(upf_id, pos)
+    network.set_psa(scenario["psa"])
+    if scenario.get("k_nearest") or scenario.get("radius") is not None:
+        network.connect_nearest(scenario.get("k_nearest"), scenario.get("radius"))
+    else:
+        network.connect_all()
+    return network
@@ -0,0 +1,62 @@
+import json
+
+# Counters summed by totals(); the rest of a record describes the call
+COUNTERS = ("pushes", "pops", "expanded", "stale_pops", "scanned", "pruned_bound",
+            "pruned_dominated", "pruned_budget", "pruned_capacity", "pruned_rules", "pruned_geometry",
+            "bound_s", "prune_s", "search_s")
+
+
+class SearchStats:
+    """Per-call label search counters, collected while set as UPFNetwork.stats.
+
+    Every search appends one record: the endpoints and hops, whether it was
+    a constrained_dijkstra() cache hit, heap pushes and pops, pops dropped
+    as dominated (stale_pops), labels expanded, neighbors scanned and why
+    they were pruned (no finite bound, dominated by an expanded label, over
+    the delay budget, short of link capacity, or a visited/edge UPF rule),
+    the UPFs removed up front by constrained_dijkstra(prune=True), the
+    largest heap size, and the seconds spent building bounds, pruning and
+    searching. Searches run in worker processes are not recorded.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, **fields):
+        self.calls.append(fields)
+        return fields
+
+    def clear(self):
+        self.calls.clear()
+
+    def totals(self):
+        totals = {name: 0 for name in COUNTERS}
+        for call in self.calls:
+            for name in COUNTERS:
+                totals[name] += call.get(name, 0)
+        totals["calls"] = len(self.calls)
+        totals["cache_hits"] = sum(1 for call in self.calls if call.get("cached"))
+        totals["max_heap"] = max((call.get("max_heap", 0) for call in self.calls), default=0)
+        return totals
+
+    def as_dict(self):
+        return {"totals": self.totals(), "calls": self.calls}
+
+    def to_json(self, path=None):
+        """The totals and every call as JSON, also written to `path` when given."""
+        report = json.dumps(self.as_dict(), indent=2)
+        if path:
+            with open(path, "w") as f:
+                f.write(report + "\n")
+        return report
+
+    def summary(self):
+        t = self.totals()
+        return (f"{t['calls']} searches ({t['cache_hits']} cached): {t['pushes']} pushes, "
+                f"{t['pops']} pops ({t['stale_pops']} stale), {t['expanded']} expanded, "
+                f"{t['scanned']} neighbors scanned, pruned {t['pruned_bound']} by bound / "
+                f"{t['pruned_dominated']} dominated / {t['pruned_budget']} over budget / "
+                f"{t['pruned_capacity']} short of capacity / "
+                f"{t['pruned_rules']} by rules, {t['pruned_geometry']} UPFs pre-pruned, max heap "
+                f"{t['max_heap']}, {t['bound_s'] * 1000:.2f} ms bounds + {t['prune_s'] * 1000:.2f} ms pruning + "
+                f"{t['search_s'] * 1000:.2f} ms search")
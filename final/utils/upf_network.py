@@ -0,0 +1,1310 @@
+import json
+import math
+import time
+import heapq
+import itertools
+from collections import OrderedDict, defaultdict
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from utils import geodesic
+
+
+def condensed_distances(points):
+    """Pairwise planar distances as a float32 condensed matrix.
+
+    Entry (i, j) with i < j sits at i*(2n-i-1)/2 + j-i-1, the row-major upper
+    triangle layout used by scipy's pdist.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    xs, ys = np.ascontiguousarray(points[:, 0]), np.ascontiguousarray(points[:, 1])
+    distances = np.empty(n * (n - 1) // 2, dtype=np.float32)
+    offset = 0
+    for i in range(n - 1):
+        dx = xs[i+1:] - xs[i]
+        dy = ys[i+1:] - ys[i]
+        np.sqrt(dx * dx + dy * dy, out=dx)
+        distances[offset:offset + n - i - 1] = dx
+        offset += n - i - 1
+    return distances
+
+
+class _ScanLocator:
+    """Stand-in for cKDTree.query() without SciPy: one vectorized scan per query.
+
+    Returns (distances, indices) sorted by distance, always as arrays.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def query(self, x, k=1):
+        distances = np.sqrt(((self.data - x) ** 2).sum(axis=1))
+        if k < len(distances):
+            nearest = np.argpartition(distances, k - 1)[:k]
+        else:
+            nearest = np.arange(len(distances))
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return distances[nearest], nearest
+
+
+class _ByName(MutableMapping):
+    """Name-keyed view over a per-UPF list indexed by UPF id.
+
+    `on_change(id, old, new)` is called after every assignment through the view.
+    """
+
+    def __init__(self, network, values, on_change=None):
+        self._network = network
+        self._values = values
+        self._on_change = on_change
+
+    def __getitem__(self, upf):
+        return self._values[self._network.ids[upf]]
+
+    def __setitem__(self, upf, value):
+        i = self._network.ids[upf]
+        old = self._values[i]
+        self._values[i] = value
+        if self._on_change is not None:
+            self._on_change(i, old, value)
+
+    def __delitem__(self, upf):
+        raise TypeError("UPFs cannot be removed from a network")
+
+    def __iter__(self):
+        return iter(self._network.names)
+
+    def __len__(self):
+        return len(self._network.names)
+
+
+class _GeometricLayer:
+    """One hop layer of geometric_bounds(): the same bound for every predecessor."""
+
+    def __init__(self, reach, constant):
+        self.reach = reach
+        self.constant = constant
+
+    def get(self, upf):
+        bound = self.reach[upf] + self.constant
+        return bound, None, bound, None
+
+
+class UPFNetwork:
+    METRICS = ("planar", "haversine")
+    # One-way delay model for delay budgets, in ms: light in fiber covers
+    # about 200 km per ms, and each UPF on a path adds its processing delay
+    PROPAGATION_MS_PER_KM = 0.005
+    UPF_DELAY_MS = 0.05
+
+    def __init__(self, metric="planar"):
+        # Positions are planar (x, y) points, or (latitude, longitude) points
+        # with great-circle distances in km under the haversine metric
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown distance metric {metric!r}, expected one of {self.METRICS}")
+        self.metric = metric
+        # UPFs are numbered in insertion order; names[id] is the display name.
+        # upf_positions and upf_loads are name-keyed views over coords/loads.
+        self.names = []
+        self.ids = {}
+        self.coords = []
+        self.loads = []
+        self.upf_positions = _ByName(self, self.coords)
+        self.upf_loads = _ByName(self, self.loads, self._load_changed)
+        # Per-UPF processing delay (ms) and propagation delay per distance unit
+        self.delays = []
+        self.upf_delays = _ByName(self, self.delays, self._delay_changed)
+        self._propagation_delay = self.PROPAGATION_MS_PER_KM
+        # Optional link capacity model (distance -> Mbps, e.g.
+        # distance.link_bandwidth) and the Mbps reserved on each link, keyed
+        # by (lower id, higher id)
+        self._capacity_model = None
+        self.link_flow = {}
+        self.psa_position = None
+        self.psa_upf = "psa"
+        self.edge_ids = set()
+        # Edges added with connect_upfs(), packed into CSR arrays on demand
+        self.links = defaultdict(dict)
+        self._csr = None
+        # KD-tree over UPF positions (PSA excluded) for gNB attachment
+        self._locator = None
+        # route() results by (start id, end id, hops, alpha, beta), and the
+        # keys a load or topology change may have made stale
+        self.routes = {}
+        self.dirty = set()
+        # constrained_dijkstra() results, LRU-evicted and keyed on `version`,
+        # which every topology or load change made through the API bumps
+        self.version = 0
+        self.cache_size = 256
+        self.path_cache = OrderedDict()
+        # Bounds of recent misses, shared by every start searching toward the same end
+        self.bounds_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Labels expanded by the last label search, UPFs the last
+        # constrained_dijkstra(prune=True) removed, and an optional
+        # search_stats.SearchStats that records every search
+        self.expanded = 0
+        self.pruned = 0
+        self.stats = None
+        # Full mesh built by connect_all() over the ids below mesh_size
+        self.mesh_size = 0
+        self.positions = np.empty((0, 2))
+        self.distances = np.empty(0, dtype=np.float32)
+
+    def _node(self, upf):
+        i = self.ids.get(upf)
+        if i is None:
+            i = len(self.names)
+            self.names.append(upf)
+            self.ids[upf] = i
+            self.coords.append(None)
+            self.loads.append(0)
+            self.delays.append(self.UPF_DELAY_MS)
+            self._csr = None
+        return i
+
+    def add_upf(self, upf_id, position):
+        self._place(self._node(upf_id), position)
+
+    def set_psa(self, position):
+        self.psa_position = position
+        self._place(self._node(self.psa_upf), position)
+
+    def _place(self, i, position):
+        # Cached bounds and pruning masks read positions
+        if self.coords[i] != position:
+            self.coords[i] = position
+            self._topology_changed()
+        self._locator = None
+
+    @property
+    def propagation_delay(self):
+        return self._propagation_delay
+
+    @propagation_delay.setter
+    def propagation_delay(self, ms_per_unit):
+        if ms_per_unit != self._propagation_delay:
+            self._propagation_delay = ms_per_unit
+            self._topology_changed()
+
+    @property
+    def capacity_model(self):
+        return self._capacity_model
+
+    @capacity_model.setter
+    def capacity_model(self, model):
+        if model is not self._capacity_model:
+            self._capacity_model = model
+            self._topology_changed()
+
+    @property
+    def edge_upfs(self):
+        return frozenset(self.names[i] for i in self.edge_ids)
+
+    @edge_upfs.setter
+    def edge_upfs(self, upfs):
+        edge_ids = {self.ids[upf] for upf in upfs}
+        if edge_ids != self.edge_ids:
+            self.edge_ids = edge_ids
+            self._topology_changed()
+
+    def connect_upfs(self, upf1, upf2):
+        i, j = self.ids[upf1], self.ids[upf2]
+        distance = self.point_distance(self.coords[i], self.coords[j])
+        self.links[i][j] = distance
+        self.links[j][i] = distance
+        self._topology_changed()
+
+    def point_distance(self, p, q):
+        """Distance between two positions under the network metric."""
+        if self.metric == "haversine":
+            return geodesic.pair_distance(p, q)
+        return math.dist(p, q)
+
+    def _distances_from(self, point, points):
+        """Distances from `point` to each row of an (n, 2) array of positions."""
+        if self.metric == "haversine":
+            return geodesic.one_to_many(point, points)
+        return np.hypot(*(np.asarray(points, dtype=np.float64).reshape(-1, 2) - point).T)
+
+    def _tree_points(self, points):
+        """Positions as KD-tree points; great-circle order is chord order on the unit sphere."""
+        if self.metric == "haversine":
+            return geodesic.to_unit_vectors(points)
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+    def _tree_distance(self, distances):
+        if self.metric == "haversine":
+            return geodesic.chord_to_km(distances)
+        return distances
+
+    def _topology_changed(self):
+        self._csr = None
+        self.version += 1
+        self.dirty.update(self.routes)
+
+    def connect_all(self):
+        """Connect every UPF to every other one.
+
+        Positions are packed into one array and the mesh weights live in a
+        condensed float32 matrix, so no per-edge dicts are built. Edges added
+        with connect_upfs() take precedence over mesh weights.
+        """
+        self.mesh_size = len(self.names)
+        self.positions = np.array(self.coords, dtype=np.float64).reshape(-1, 2)
+        if self.metric == "haversine":
+            self.distances = geodesic.pairwise(self.positions)
+        else:
+            self.distances = condensed_distances(self.positions)
+        self._topology_changed()
+
+    def connect_nearest(self, k=None, radius=None):
+        """Connect each UPF to its k nearest UPFs and/or every UPF within `radius`.
+
+        Neighbors come from a KD-tree over the UPF positions, so the number of
+        edges grows linearly with the number of UPFs. Edges are undirected and
+        stored like connect_upfs() edges. Under the haversine metric `radius`
+        is in km.
+        """
+        from scipy.spatial import cKDTree
+
+        points = np.array(self.coords, dtype=np.float64).reshape(-1, 2)
+        n = len(points)
+        tree = cKDTree(self._tree_points(points))
+        pairs = [np.empty((0, 2), dtype=np.int64)]
+        if k and n > 1:
+            # The closest hit of every point is usually the point itself
+            _, nearest = tree.query(tree.data, k=min(k + 1, n))
+            rows = np.repeat(np.arange(n), nearest.shape[1])
+            cols = nearest.ravel()
+            keep = rows != cols
+            pairs.append(np.stack([rows[keep], cols[keep]], axis=1))
+        if radius is not None:
+            if self.metric == "haversine":
+                radius = float(geodesic.km_to_chord(radius))
+            pairs.append(tree.query_pairs(radius, output_type="ndarray").astype(np.int64))
+        pairs = np.unique(np.sort(np.concatenate(pairs), axis=1), axis=0)
+
+        if self.metric == "haversine":
+            distances = geodesic.haversine(*points[pairs[:, 0]].T, *points[pairs[:, 1]].T)
+        else:
+            distances = np.hypot(*(points[pairs[:, 0]] - points[pairs[:, 1]]).T)
+        for (i, j), distance in zip(pairs.tolist(), distances.tolist()):
+            self.links[i][j] = distance
+            self.links[j][i] = distance
+        self._topology_changed()
+
+    def locator(self):
+        """KD-tree over every UPF except the PSA, with the UPF id of each point.
+
+        Without SciPy a linear scan answers the same queries.
+        """
+        if self._locator is None:
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                cKDTree = _ScanLocator
+
+            psa = self.ids.get(self.psa_upf)
+            ids = np.array([i for i in range(len(self.names)) if i != psa], dtype=np.int64)
+            points = np.array([self.coords[i] for i in ids], dtype=np.float64).reshape(-1, 2)
+            self._locator = (cKDTree(self._tree_points(points)) if len(ids) else None), ids
+        return self._locator
+
+    def nearest_upfs(self, point, k=1):
+        """The k UPFs (PSA excluded) closest to `point` as (name, distance) pairs."""
+        tree, ids = self.locator()
+        if tree is None:
+            return []
+        distances, found = tree.query(self._tree_points(point)[0], k=min(k, len(ids)))
+        distances = self._tree_distance(np.atleast_1d(distances))
+        return [(self.names[i], d) for i, d in zip(ids[np.atleast_1d(found)].tolist(), distances.tolist())]
+
+    def select_edge_upf(self, point, alpha=1.0, beta=0.5, min_load=None, exclude=None):
+        """UPF (PSA excluded) minimizing alpha*distance + beta*load from `point`.
+
+        Candidates are taken from the KD-tree in growing batches of nearest
+        UPFs until alpha times the farthest candidate distance plus beta times
+        `min_load` cannot match the best candidate. `min_load` must not exceed
+        any UPF load; it defaults to the current minimum, which stays valid
+        across calls as long as loads only grow. Ties go to the lowest id,
+        like a scan in insertion order. `exclude` is a boolean array over UPF
+        ids whose True entries may not be picked, e.g. UPFs carrying other
+        paths; None is returned if it excludes every UPF. Falls back to the
+        PSA without UPFs.
+        """
+        tree, ids = self.locator()
+        if tree is None:
+            return self.psa_upf
+        if min_load is None:
+            min_load = min(self.loads[i] for i in ids.tolist())
+
+        k = 8
+        while True:
+            k = min(k, len(ids))
+            distances, found = tree.query(self._tree_points(point)[0], k=k)
+            best_cost, best_upf = min(
+                ((alpha * self.point_distance(point, self.coords[i]) + beta * self.loads[i], i)
+                 for i in ids[np.atleast_1d(found)].tolist() if exclude is None or not exclude[i]),
+                default=(math.inf, None))
+            farthest = self._tree_distance(np.atleast_1d(distances)[-1])
+            if k == len(ids) or alpha * farthest + beta * min_load > best_cost:
+                return None if best_upf is None else self.names[best_upf]
+            k *= 4
+
+    def adjacency(self):
+        """connect_upfs() edges as CSR arrays (indptr, indices, weights)."""
+        if self._csr is None:
+            n = len(self.names)
+            counts = np.zeros(n + 1, dtype=np.int64)
+            for i, neighbors in self.links.items():
+                counts[i + 1] = len(neighbors)
+            indptr = np.cumsum(counts)
+            indices = np.empty(indptr[-1], dtype=np.int64)
+            weights = np.empty(indptr[-1], dtype=np.float64)
+            for i, neighbors in self.links.items():
+                indices[indptr[i]:indptr[i + 1]] = list(neighbors)
+                weights[indptr[i]:indptr[i + 1]] = list(neighbors.values())
+            self._csr = indptr, indices, weights
+        return self._csr
+
+    def _mesh_row(self, i):
+        n = self.mesh_size
+        row = np.empty(n, dtype=np.float32)
+        before = np.arange(i)
+        row[:i] = self.distances[before * (2*n - before - 1) // 2 + i - before - 1]
+        start = i * (2*n - i - 1) // 2
+        row[i+1:] = self.distances[start:start + n - i - 1]
+        row[i] = 0
+        return row
+
+    def _adjacent(self, i, keep=None):
+        """(neighbor id, distance) pairs of UPF id `i`, only among ids set in `keep` when given."""
+        indptr, indices, weights = self.adjacency()
+        lo, hi = indptr[i], indptr[i + 1]
+        if i >= self.mesh_size:
+            ids = indices[lo:hi]
+            if keep is None:
+                return zip(ids.tolist(), weights[lo:hi].tolist())
+            return zip(ids[keep[ids]].tolist(), weights[lo:hi][keep[ids]].tolist())
+        row = np.full(len(self.names), np.inf)
+        row[:self.mesh_size] = self._mesh_row(i)
+        row[indices[lo:hi]] = weights[lo:hi]
+        row[i] = np.inf
+        if keep is not None:
+            row[~keep] = np.inf
+        ids = np.flatnonzero(row < np.inf)
+        return zip(ids.tolist(), row[ids].tolist())
+
+    def neighbors(self, upf):
+        """Map each UPF connected to `upf` to its distance."""
+        return {self.names[j]: distance for j, distance in self._adjacent(self.ids[upf])}
+
+    def _distance(self, i, j):
+        explicit = self.links.get(i)
+        if explicit and j in explicit:
+            return explicit[j]
+        if i == j or max(i, j) >= self.mesh_size:
+            raise KeyError((self.names[i], self.names[j]))
+        i, j = min(i, j), max(i, j)
+        n = self.mesh_size
+        return float(self.distances[i * (2*n - i - 1) // 2 + j - i - 1])
+
+    def distance(self, upf1, upf2):
+        return self._distance(self.ids[upf1], self.ids[upf2])
+
+    def relabel(self, old_to_new):
+        """Rename UPFs in place; everything else is indexed by id and kept as is."""
+        self.names[:] = [old_to_new.get(upf, upf) for upf in self.names]
+        self.ids = {upf: i for i, upf in enumerate(self.names)}
+        self.psa_upf = old_to_new.get(self.psa_upf, self.psa_upf)
+
+    def get_path_cost(self, path, alpha=1.0, beta=0.5):
+        return self._path_cost([self.ids[upf] for upf in path], alpha, beta)
+
+    def _path_cost(self, path, alpha, beta):
+        total_cost = 0
+        for i in range(len(path)-1):
+            current = path[i]
+            next_node = path[i+1]
+            distance = self._distance(current, next_node)
+            load_cost = self.loads[next_node]
+            total_cost += alpha * distance + beta * load_cost
+        return total_cost
+
+    def path_delay(self, path):
+        """One-way delay (ms) of a path: propagation over its links plus each UPF's processing."""
+        ids = [self.ids[upf] for upf in path]
+        distance = sum(self._distance(ids[i], ids[i + 1]) for i in range(len(ids) - 1))
+        return self.propagation_delay * distance + sum(self.delays[i] for i in ids)
+
+    def delay_floor(self, end, exact_hops):
+        """Lower bounds on the delay still to come, toward UPF id `end`.
+
+        A UPF with r hops left is at least its straight-line propagation delay
+        from end away, and still pays the processing delay of end plus at
+        least the smallest one for each of the r-1 UPFs before it. Returns
+        (reach by UPF id, constant by r). Distances are shaved like
+        geometric_bounds() so the bound stays admissible against float32
+        mesh weights.
+        """
+        coords = np.array(self.coords, dtype=np.float64).reshape(-1, 2)
+        straight = np.asarray(self._distances_from(coords[end], coords)).astype(np.float32)
+        reach = (self.propagation_delay * (1 - 1e-6) * straight.astype(np.float64)).tolist()
+        min_delay = min(self.delays)
+        constant = [0.0] + [self.delays[end] + min_delay * (remaining - 1) for remaining in range(1, exact_hops)]
+        return reach, constant
+
+    def link_capacity(self, upf1, upf2):
+        """Capacity (Mbps) capacity_model gives the link between two UPFs."""
+        return float(self.capacity_model(self.distance(upf1, upf2)))
+
+    def residual_capacity(self, upf1, upf2):
+        i, j = sorted((self.ids[upf1], self.ids[upf2]))
+        return self.link_capacity(upf1, upf2) - self.link_flow.get((i, j), 0)
+
+    def reserve_path(self, path, demand):
+        """Reserve `demand` Mbps on every link of a path; KeyError if a link is missing."""
+        ids = [self.ids[upf] for upf in path]
+        for a, b in zip(ids, ids[1:]):
+            self._distance(a, b)
+        for a, b in zip(ids, ids[1:]):
+            key = min(a, b), max(a, b)
+            flow = self.link_flow.get(key, 0) + demand
+            if flow > 1e-9:
+                self.link_flow[key] = flow
+            else:
+                self.link_flow.pop(key, None)
+        self.version += 1
+
+    def release_path(self, path, demand):
+        self.reserve_path(path, -demand)
+
+    def _capacity_limits(self, demand):
+        """Longest link that can carry `demand` Mbps, and the directed links too full to.
+
+        capacity_model must not grow with distance; the reach is found by
+        bisection so any such model works.
+        """
+        model = self.capacity_model
+        if model(0.0) < demand:
+            max_distance = -1.0
+        else:
+            low, high = 0.0, 1.0
+            while model(high) >= demand and high < 1e12:
+                low, high = high, 2 * high
+            if model(high) >= demand:
+                max_distance = math.inf
+            else:
+                for _ in range(100):
+                    middle = (low + high) / 2
+                    if model(middle) >= demand:
+                        low = middle
+                    else:
+                        high = middle
+                max_distance = low
+        saturated = set()
+        for (i, j), flow in self.link_flow.items():
+            if model(self._distance(i, j)) - flow < demand:
+                saturated.update(((i, j), (j, i)))
+        return max_distance, saturated
+
+    def _link_pairs(self):
+        """Every link once as arrays (lower ids, higher ids, distances)."""
+        n = self.mesh_size
+        first, second = np.triu_indices(n, 1)
+        distances = self.distances.astype(np.float64)
+        indptr, indices, weights = self.adjacency()
+        rows = np.repeat(np.arange(len(self.names)), np.diff(indptr))
+        upper = rows < indices
+        link_first, link_second, link_distances = rows[upper], indices[upper], weights[upper]
+        # Explicit links replace mesh weights
+        size = len(self.names)
+        override = np.isin(first * size + second, link_first * size + link_second)
+        return (np.concatenate([first[~override], link_first]),
+                np.concatenate([second[~override], link_second]),
+                np.concatenate([distances[~override], link_distances]))
+
+    def max_flow(self, demands):
+        """Mbps the residual link capacities can carry from edge UPFs to the PSA.
+
+        `demands` maps edge UPF names to Mbps. A super source feeds each edge
+        UPF its demand and every link carries its residual capacity in both
+        directions. This relaxes the exact-hop and edge UPF rules, so a result
+        below the total demand proves that no plan can serve every UE without
+        oversubscribing a link; the converse does not hold. Capacities are
+        rounded up and demands down to 10 kbps, keeping that proof sound.
+        """
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import maximum_flow
+
+        unit = 0.01
+        size = len(self.names)
+        first, second, distances = self._link_pairs()
+        capacity = np.asarray(self.capacity_model(distances), dtype=np.float64).copy()
+        if self.link_flow:
+            keys = first * size + second
+            order = np.argsort(keys)
+            flows = np.array(list(self.link_flow.values()), dtype=np.float64)
+            flow_keys = np.array([i * size + j for i, j in self.link_flow], dtype=np.int64)
+            capacity[order[np.searchsorted(keys, flow_keys, sorter=order)]] -= flows
+        capacity = np.ceil(np.maximum(capacity, 0) / unit)
+
+        sources = np.array([self.ids[upf] for upf in demands], dtype=np.int64)
+        supply = np.floor(np.array(list(demands.values()), dtype=np.float64) / unit)
+        rows = np.concatenate([first, second, np.full(len(sources), size)])
+        cols = np.concatenate([second, first, sources])
+        values = np.concatenate([capacity, capacity, supply]).astype(np.int32)
+        graph = coo_matrix((values, (rows, cols)), shape=(size + 1, size + 1)).tocsr()
+        graph.eliminate_zeros()
+        return maximum_flow(graph, size, self.ids[self.psa_upf]).flow_value * unit
+
+    def hop_bounds(self, end, exact_hops, alpha=1.0, beta=0.5):
+        """Hop-layered DP toward UPF id `end` over walks that never step straight back.
+
+        bounds[r][id] is (best, successor, second best, its successor) for
+        walks from that UPF reaching end in exactly r more hops; the second
+        best leaves through a different successor. Simple paths never
+        backtrack, so these are lower bounds for them.
+        """
+        bounds = [{end: (0, None, math.inf, None)}]
+        for remaining in range(1, exact_hops):
+            previous = bounds[-1]
+            layer = {}
+            for upf, (best, successor, second, _) in previous.items():
+                if remaining > 1 and (upf == end or upf in self.edge_ids):
+                    continue
+                load_cost = beta * self.loads[upf]
+                for neighbor, distance in self._adjacent(upf):
+                    rest = second if neighbor == successor else best
+                    cost = alpha * distance + load_cost + rest
+                    current = layer.get(neighbor)
+                    if current is None:
+                        layer[neighbor] = (cost, upf, math.inf, None)
+                    elif cost < current[0]:
+                        layer[neighbor] = (cost, upf, current[0], current[1])
+                    elif cost < current[2]:
+                        layer[neighbor] = (current[0], current[1], cost, upf)
+            bounds.append(layer)
+        return bounds
+
+    def geometric_bounds(self, end, exact_hops, alpha=1.0, beta=0.5):
+        """A* heuristic in the layout of hop_bounds(), toward UPF id `end`.
+
+        With r hops left a UPF is at least alpha times its straight-line (or
+        great-circle) distance from end away, and the path pays beta times the load of end
+        plus at least the minimum load for each of the r-1 UPFs before it.
+        Distances are rounded like the float32 mesh and shaved slightly, so
+        the bound stays admissible. Building it is O(n) instead of O(m*E).
+        """
+        coords = np.array(self.coords, dtype=np.float64).reshape(-1, 2)
+        straight = np.asarray(self._distances_from(coords[end], coords)).astype(np.float32)
+        reach = (alpha * (1 - 1e-6) * straight.astype(np.float64)).tolist()
+        min_load = min(self.loads)
+        bounds = [{end: (0, None, 0, None)}]
+        for remaining in range(1, exact_hops):
+            bounds.append(_GeometricLayer(reach, beta * (self.loads[end] + min_load * (remaining - 1))))
+        return bounds
+
+    @staticmethod
+    def _bound(layer, upf, previous):
+        entry = layer.get(upf)
+        if entry is None:
+            return math.inf
+        return entry[2] if entry[1] == previous else entry[0]
+
+    @staticmethod
+    def _bound_walk(bounds, start, exact_hops):
+        """Follow the successors behind the bound of `start`."""
+        walk = [start]
+        previous = None
+        for remaining in range(exact_hops - 1, 0, -1):
+            entry = bounds[remaining][walk[-1]]
+            successor = entry[3] if entry[1] == previous else entry[1]
+            previous = walk[-1]
+            walk.append(successor)
+        return walk
+
+    def constrained_dijkstra(self, start, end, exact_hops, alpha=1.0, beta=0.5, astar=False, delay_budget=None,
+                             demand=None, prune=False):
+        """Cheapest simple path of exactly `exact_hops` UPFs from start to end.
+
+        Labels are (node, hop) states holding a parent pointer and a bitmask of
+        the UPF ids visited so far, so no path is copied during the search.
+        Labels are ordered by cost plus the `hop_bounds` estimate of the
+        remaining hops, and a label is dropped when a label already expanded at
+        the same (node, hop) was no more expensive and visited a subset of its
+        UPFs. With `astar` the cheaper geometric_bounds() replace hop_bounds().
+
+        With a `delay_budget` (ms) the path must also fit within that one-way
+        delay, see path_delay(). Labels then carry their delay too, a label
+        only dominates another that is no cheaper and no faster, and a label
+        is dropped as soon as its delay plus delay_floor() exceeds the budget.
+
+        With a `demand` (Mbps) and a capacity_model, links whose residual
+        capacity cannot carry it are never used; reserve_path() then books
+        the demand on the chosen path. Results are cached, see cache_info(),
+        and so are the bounds of the last few misses, which later searches
+        from other starts toward the same end reuse.
+
+        With `prune` the search only runs over the UPFs candidate_mask()
+        keeps for the cost of a greedy first path; the result is the same and
+        the number of UPFs removed is left in `pruned`.
+        """
+        key = (self.ids.get(start), self.ids[end], exact_hops, alpha, beta, astar, delay_budget, demand,
+               self.version)
+        if key in self.path_cache:
+            self.path_cache.move_to_end(key)
+            self.cache_hits += 1
+            self.expanded = 0
+            result = self.path_cache[key]
+            if self.stats is not None:
+                self.stats.record(start=start, end=end, hops=exact_hops, astar=astar, cached=True,
+                                  found=result is not None)
+        else:
+            self.cache_misses += 1
+            began = time.perf_counter()
+            bounds = self._cached_bounds(key[1], exact_hops, alpha, beta, astar)
+            bound_s = time.perf_counter() - began
+            keep = None
+            if prune:
+                began = time.perf_counter()
+                keep = self._prune(key[0], key[1], exact_hops, alpha, beta, bounds, delay_budget, demand)
+                prune_s = time.perf_counter() - began
+            result = self._label_search(key[0], key[1], exact_hops, alpha, beta, bounds,
+                                        delay_budget=delay_budget, demand=demand, keep=keep)
+            if self.stats is not None:
+                self.stats.calls[-1].update(astar=astar, bound_s=bound_s)
+                if prune:
+                    self.stats.calls[-1].update(pruned_geometry=self.pruned, prune_s=prune_s)
+            self._cache_result(key, result)
+        if result is None:
+            within = f" within {delay_budget} ms" if delay_budget is not None else ""
+            if demand is not None and self.capacity_model is not None:
+                within += f" with {demand} Mbps of free link capacity"
+            raise ValueError(f"No valid path of exactly {exact_hops} nodes from {start} to {end}{within}")
+        return self._named(result)
+
+    def candidate_mask(self, start, end, exact_hops, alpha=1.0, beta=0.5, incumbent=math.inf):
+        """Boolean array over UPF ids that may lie on a path costing at most `incumbent`.
+
+        A path through UPF v covers at least the straight-line (or
+        great-circle) distance from start to v and from v to end, and pays
+        the load of v, of end and at least the minimum load for each other
+        UPF, so every v whose bound exceeds `incumbent` lies outside an
+        ellipse around the two ends and is dropped. Takes UPF ids; the
+        distances are rounded like the mesh and shaved like geometric_bounds().
+        """
+        n = len(self.names)
+        if exact_hops < 3 or incumbent == math.inf:
+            return np.ones(n, dtype=bool)
+        coords = np.array(self.coords, dtype=np.float64).reshape(-1, 2)
+        reach = np.zeros(n)
+        for endpoint in (start, end):
+            reach += np.asarray(self._distances_from(coords[endpoint], coords)).astype(np.float32)
+        loads = np.asarray(self.loads, dtype=np.float64)
+        floor = alpha * (1 - 1e-6) * reach + beta * (loads + self.loads[end] + min(self.loads) * (exact_hops - 3))
+        keep = floor <= incumbent
+        keep[start] = keep[end] = True
+        return keep
+
+    def _greedy_path(self, start, end, exact_hops, alpha, beta, bounds):
+        """Simple path from a dive that always takes the step with the best bound, or None."""
+        path = [start]
+        cost = 0
+        for remaining in range(exact_hops - 2, -1, -1):
+            current = path[-1]
+            best = None
+            for neighbor, distance in self._adjacent(current):
+                if neighbor in path or (neighbor == end) != (remaining == 0):
+                    continue
+                if neighbor in self.edge_ids and neighbor != end:
+                    continue
+                rest = self._bound(bounds[remaining], neighbor, current)
+                step = alpha * distance + beta * self.loads[neighbor]
+                if rest < math.inf and (best is None or step + rest < best[0]):
+                    best = step + rest, step, neighbor
+            if best is None:
+                return None
+            cost += best[1]
+            path.append(best[2])
+        return path, cost
+
+    def _prune(self, start, end, exact_hops, alpha, beta, bounds, delay_budget=None, demand=None):
+        """candidate_mask() for the cost of a greedy path, or None when there is nothing to prune."""
+        self.pruned = 0
+        if start is None or exact_hops < 3 or not bounds:
+            return None
+        found = self._greedy_path(start, end, exact_hops, alpha, beta, bounds)
+        if found is None:
+            return None
+        path, cost = found
+        # The incumbent only bounds the answer if it meets the same constraints
+        if delay_budget is not None and self.path_delay([self.names[upf] for upf in path]) > delay_budget:
+            return None
+        if demand is not None and self.capacity_model is not None:
+            max_distance, saturated = self._capacity_limits(demand)
+            if any(self._distance(a, b) > max_distance or (a, b) in saturated for a, b in zip(path, path[1:])):
+                return None
+        keep = self.candidate_mask(start, end, exact_hops, alpha, beta, cost)
+        self.pruned = len(keep) - int(keep.sum())
+        return keep
+
+    def _cached_bounds(self, end, exact_hops, alpha, beta, astar):
+        if exact_hops < 1:
+            return []
+        key = end, exact_hops, alpha, beta, astar, self.version
+        bounds = self.bounds_cache.get(key)
+        if bounds is None:
+            make_bounds = self.geometric_bounds if astar else self.hop_bounds
+            bounds = self.bounds_cache[key] = make_bounds(end, exact_hops, alpha, beta)
+            if len(self.bounds_cache) > 8:
+                self.bounds_cache.popitem(last=False)
+        else:
+            self.bounds_cache.move_to_end(key)
+        return bounds
+
+    def _cache_result(self, key, result):
+        if self.cache_size > 0:
+            self.path_cache[key] = result
+            if len(self.path_cache) > self.cache_size:
+                self.path_cache.popitem(last=False)
+
+    def hop_table(self, start, end, max_hops, alpha=1.0, beta=0.5):
+        """Cheapest path from start to end for every exact_hops from 2 to max_hops.
+
+        hop_bounds() layers are indexed by the hops left, so one DP pass up
+        to max_hops bounds the label search of every row. Rows also land in
+        the constrained_dijkstra() cache, so trying another m afterwards is a
+        cache hit. Returns {exact_hops: (path, cost)} for the hop counts that
+        have a path; see pareto_frontier().
+        """
+        start_id, end_id = self.ids.get(start), self.ids[end]
+        max_hops = min(max_hops, len(self.names))
+        began = time.perf_counter()
+        bounds = self.hop_bounds(end_id, max_hops, alpha, beta) if max_hops >= 2 else []
+        bound_s = time.perf_counter() - began
+        table = {}
+        for exact_hops in range(2, max_hops + 1):
+            result = self._label_search(start_id, end_id, exact_hops, alpha, beta, bounds)
+            if self.stats is not None:
+                # The shared bounds are charged to the first row
+                self.stats.calls[-1].update(astar=False, bound_s=bound_s)
+                bound_s = 0
+            self._cache_result((start_id, end_id, exact_hops, alpha, beta, False, None, None, self.version), result)
+            if result is not None:
+                table[exact_hops] = self._named(result)
+        return table
+
+    @staticmethod
+    def pareto_frontier(table):
+        """hop_table() rows cheaper than every row with fewer UPFs, as (exact_hops, path, cost).
+
+        The best path with at most m UPFs is the last entry with exact_hops <= m.
+        """
+        frontier = []
+        for exact_hops in sorted(table):
+            path, cost = table[exact_hops]
+            if not frontier or cost < frontier[-1][2]:
+                frontier.append((exact_hops, path, cost))
+        return frontier
+
+    def cache_info(self):
+        """Hit/miss statistics of the constrained_dijkstra() result cache."""
+        return {"hits": self.cache_hits, "misses": self.cache_misses,
+                "maxsize": self.cache_size, "currsize": len(self.path_cache), "version": self.version}
+
+    def clear_cache(self):
+        self.path_cache.clear()
+        self.bounds_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def constrained_paths_to(self, end, sources, exact_hops, alpha=1.0, beta=0.5, workers=None):
+        """Best exact-hop path from every UPF in `sources` to `end` in one pass.
+
+        The hop-layered DP is rooted at `end`, so it is built once for all
+        sources. Whenever the walk behind a source's bound is already simple it
+        is optimal and read off directly; otherwise the label search guided by
+        the same table settles that source. All sources see the same loads.
+        With `workers` > 1 those label searches run in a process pool that
+        shares the mesh matrix through shared memory; results keep the order
+        of `sources` either way.
+        Returns {source: (path, cost)}, with None for sources without a path.
+        """
+        end_id = self.ids[end]
+        bounds = self.hop_bounds(end_id, exact_hops, alpha, beta) if exact_hops >= 1 else []
+        results = {}
+        pending = []
+        for source in sources:
+            i = self.ids.get(source)
+            if not bounds or i is None or self._bound(bounds[-1], i, None) == math.inf:
+                results[source] = None
+                continue
+            walk = self._bound_walk(bounds, i, exact_hops)
+            if len(set(walk)) == exact_hops:
+                results[source] = walk, self._path_cost(walk, alpha, beta)
+            else:
+                results[source] = None
+                pending.append((source, i))
+
+        if workers and workers > 1 and len(pending) > 1:
+            solved = self._solve_in_pool([i for _, i in pending], end_id, exact_hops, alpha, beta,
+                                         bounds, workers)
+        else:
+            solved = [self._label_search(i, end_id, exact_hops, alpha, beta, bounds) for _, i in pending]
+        for (source, _), result in zip(pending, solved):
+            results[source] = result
+        return {source: result and self._named(result) for source, result in results.items()}
+
+    def _solve_in_pool(self, starts, end, exact_hops, alpha, beta, bounds, workers):
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+
+        shm = shared_memory.SharedMemory(create=True, size=max(self.distances.nbytes, 1))
+        try:
+            np.ndarray(self.distances.shape, np.float32, buffer=shm.buf)[:] = self.distances
+            state = self._snapshot()
+            with ProcessPoolExecutor(min(workers, len(starts)), initializer=_init_worker,
+                                     initargs=(shm.name, len(self.distances), state,
+                                               (end, exact_hops, alpha, beta, bounds))) as pool:
+                chunksize = max(1, len(starts) // (4 * workers))
+                return list(pool.map(_solve_start, starts, chunksize=chunksize))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _snapshot(self):
+        """Picklable routing state, without the mesh matrix."""
+        return {"names": self.names, "coords": self.coords, "loads": self.loads,
+                "edge_ids": self.edge_ids, "links": dict(self.links), "mesh_size": self.mesh_size,
+                "metric": self.metric}
+
+    @classmethod
+    def _from_snapshot(cls, state, distances):
+        network = cls(state["metric"])
+        network.names.extend(state["names"])
+        network.ids = {upf: i for i, upf in enumerate(network.names)}
+        network.coords.extend(state["coords"])
+        network.loads.extend(state["loads"])
+        network.edge_ids = set(state["edge_ids"])
+        network.links.update(state["links"])
+        network.mesh_size = state["mesh_size"]
+        network.distances = distances
+        return network
+
+    def save(self, path):
+        """Write positions, loads, delays, edge UPFs, links and the mesh matrix to an .npz file.
+
+        Names, the PSA name and the metric go into a JSON header entry; the
+        rest are raw arrays stored uncompressed, so load() is a few reads.
+        """
+        header = {"format": 1, "names": self.names, "psa_upf": self.psa_upf,
+                  "metric": self.metric, "mesh_size": self.mesh_size,
+                  "propagation_delay": self.propagation_delay}
+        indptr, indices, weights = self.adjacency()
+        np.savez(path,
+                 header=np.array(json.dumps(header)),
+                 coords=np.array(self.coords, dtype=np.float64).reshape(-1, 2),
+                 loads=np.asarray(self.loads),
+                 delays=np.asarray(self.delays, dtype=np.float64),
+                 edge_ids=np.array(sorted(self.edge_ids), dtype=np.int64),
+                 indptr=indptr, indices=indices, weights=weights,
+                 distances=self.distances)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Network saved with save(), with empty route and path caches.
+
+        With `mmap` the mesh matrix is mapped read-only from the file instead
+        of read into memory, so even large meshes load in milliseconds.
+        """
+        with np.load(path) as data:
+            header = json.loads(data["header"].item())
+            if header.get("format") != 1:
+                raise ValueError(f"Unsupported network snapshot format in {path}")
+            network = cls(header["metric"])
+            network.names.extend(header["names"])
+            network.ids = {upf: i for i, upf in enumerate(network.names)}
+            network.coords.extend(map(tuple, data["coords"].tolist()))
+            network.loads.extend(data["loads"].tolist())
+            network.delays.extend(data["delays"].tolist() if "delays" in data
+                                  else [cls.UPF_DELAY_MS] * len(network.names))
+            network.edge_ids = set(data["edge_ids"].tolist())
+            indptr, indices, weights = data["indptr"], data["indices"], data["weights"]
+            network.distances = (_map_npz_member(path, "distances") if mmap else None)
+            if network.distances is None:
+                network.distances = data["distances"]
+
+        network.propagation_delay = header.get("propagation_delay", cls.PROPAGATION_MS_PER_KM)
+        for i in np.flatnonzero(np.diff(indptr)).tolist():
+            lo, hi = indptr[i], indptr[i + 1]
+            network.links[i] = dict(zip(indices[lo:hi].tolist(), weights[lo:hi].tolist()))
+        network._csr = indptr, indices, weights
+        network.psa_upf = header["psa_upf"]
+        if network.psa_upf in network.ids:
+            network.psa_position = network.coords[network.ids[network.psa_upf]]
+        network.mesh_size = header["mesh_size"]
+        network.positions = np.array(network.coords[:network.mesh_size], dtype=np.float64).reshape(-1, 2)
+        return network
+
+    def route(self, start, end, exact_hops, alpha=1.0, beta=0.5):
+        """constrained_dijkstra() whose result is kept for incremental rerouting.
+
+        The route is tracked in `routes` and marked dirty when a change made
+        through `upf_loads` or to the topology may have made it suboptimal;
+        reroute_dirty() then repairs only those routes.
+        """
+        key = self.ids[start], self.ids[end], exact_hops, alpha, beta
+        if key not in self.routes or key in self.dirty:
+            self._solve_route(key)
+        result = self.routes[key]
+        if result is None:
+            raise ValueError(f"No valid path of exactly {exact_hops} nodes from {start} to {end}")
+        return self._named(result)
+
+    def reroute_dirty(self):
+        """Re-solve every dirty route.
+
+        Returns {(start, end, exact_hops, alpha, beta): (path, cost) or None}
+        for the re-solved routes, with UPF names as passed to route().
+        """
+        rerouted = {}
+        for key in list(self.dirty):
+            result = self._solve_route(key)
+            start, end, exact_hops, alpha, beta = key
+            rerouted[self.names[start], self.names[end], exact_hops, alpha, beta] = result and self._named(result)
+        return rerouted
+
+    def _solve_route(self, key):
+        start, end, exact_hops, alpha, beta = key
+        began = time.perf_counter()
+        bounds = self.hop_bounds(end, exact_hops, alpha, beta) if exact_hops >= 1 else []
+        bound_s = time.perf_counter() - began
+        result = self._label_search(start, end, exact_hops, alpha, beta, bounds)
+        if self.stats is not None:
+            self.stats.calls[-1]["bound_s"] = bound_s
+        self.routes[key] = result
+        self.dirty.discard(key)
+        return result
+
+    def _delay_changed(self, upf, old, new):
+        if old != new:
+            self.version += 1
+
+    def _load_changed(self, upf, old, new):
+        """Mark the routes a load change on UPF id `upf` can make suboptimal.
+
+        A path's cost counts the load of every UPF after its start. A higher
+        load only hurts the routes through `upf`, and a lower one only helps
+        routes that avoid it. Every path to the end UPF pays its load, so that
+        just shifts the cost; the same holds for a drop on a route's own path.
+        """
+        if old == new:
+            return
+        self.version += 1
+        for key, result in self.routes.items():
+            start, end, _, alpha, beta = key
+            if result is None or key in self.dirty or beta == 0 or upf == start:
+                continue
+            path = result[0]
+            on_path = upf in path
+            if on_path and (upf == end or new < old):
+                self.routes[key] = path, self._path_cost(path, alpha, beta)
+            elif on_path or new < old:
+                self.dirty.add(key)
+
+    def k_best_paths(self, start, end, exact_hops, k=None, alpha=1.0, beta=0.5):
+        """Lazily yield (path, cost) for simple exact-hop paths in cost order.
+
+        Yen's algorithm on top of the label search: the next path is the best
+        spur of an earlier one, where a spur keeps a prefix (root) of that path
+        and leaves it through an edge no previous path with the same root took.
+        The hop bounds toward `end` are computed once and shared by every spur
+        search. Loads are read as they are when each spur is searched, so keep
+        them fixed while consuming the generator.
+        """
+        end = self.ids[end]
+        bounds = self.hop_bounds(end, exact_hops, alpha, beta) if exact_hops >= 1 else []
+        first = self._label_search(self.ids.get(start), end, exact_hops, alpha, beta, bounds)
+        if first is None:
+            return
+
+        found = [first[0]]
+        known = {tuple(first[0])}
+        candidates = []
+        yield self._named(first)
+
+        while k is None or len(found) < k:
+            last = found[-1]
+            root_cost = 0
+            for i in range(len(last) - 1):
+                if i > 0:
+                    root_cost += alpha * self._distance(last[i-1], last[i]) + beta * self.loads[last[i]]
+                root = last[:i+1]
+                blocked = 0
+                for upf in root[:-1]:
+                    blocked |= 1 << upf
+                blocked_next = {path[i+1] for path in found if path[:i+1] == root}
+                spur = self._label_search(last[i], end, exact_hops - i, alpha, beta, bounds,
+                                          blocked, blocked_next)
+                if spur is None:
+                    continue
+                path = root[:-1] + spur[0]
+                if tuple(path) not in known:
+                    known.add(tuple(path))
+                    heapq.heappush(candidates, (root_cost + spur[1], path))
+
+            if not candidates:
+                return
+            cost, path = heapq.heappop(candidates)
+            found.append(path)
+            yield self._named((path, cost))
+
+    def backup_path(self, path, alpha=1.0, beta=0.5, astar=False, delay_budget=None, demand=None):
+        """Failover path for `path` with the same ends and hop count, or None.
+
+        The backup shares as few intermediate UPFs with `path` as possible:
+        the cheapest node-disjoint path when one exists, otherwise the
+        cheapest path keeping the fewest of them. Each candidate set of kept
+        UPFs is one label search with the others blocked, all sharing one set
+        of bounds. Returns (backup path, cost, shared UPFs). The backup obeys
+        the same delay budget and demand but books nothing, so a failover
+        only needs reserve_path() on it. Two-UPF paths have no backup.
+        """
+        ids = [self.ids[upf] for upf in path]
+        inner = ids[1:-1]
+        if not inner:
+            return None
+        exact_hops = len(ids)
+        make_bounds = self.geometric_bounds if astar else self.hop_bounds
+        bounds = make_bounds(ids[-1], exact_hops, alpha, beta)
+        backup = None
+        # Keeping every intermediate UPF would not survive any of them failing
+        for shared in range(len(inner)):
+            for kept in itertools.combinations(inner, shared):
+                blocked = 0
+                for upf in inner:
+                    if upf not in kept:
+                        blocked |= 1 << upf
+                result = self._label_search(ids[0], ids[-1], exact_hops, alpha, beta, bounds, blocked,
+                                            delay_budget=delay_budget, demand=demand)
+                if result is not None and (backup is None or result[1] < backup[1]):
+                    backup = result
+            if backup is not None:
+                backup_path, cost = self._named(backup)
+                return backup_path, cost, [upf for upf in backup_path[1:-1] if upf in path]
+        return None
+
+    def _named(self, result):
+        path, cost = result
+        return [self.names[upf] for upf in path], cost
+
+    def _label_search(self, start, end, exact_hops, alpha, beta, bounds, blocked=0, blocked_next=(),
+                      delay_budget=None, demand=None, keep=None):
+        """Run the label search between UPF ids, returning (id path, cost) or None.
+
+        `blocked` is a mask of UPF ids the path may not visit and
+        `blocked_next` holds the ids that may not directly follow `start`.
+        A `delay_budget` adds a delay dimension to the labels, a `demand` with a
+        capacity_model skips links that cannot carry it, and a `keep` mask
+        from candidate_mask() limits the search to those UPFs. The number of labels
+        expanded is left in `expanded`, and the search is recorded in `stats`
+        when set.
+        """
+        options = {"delay_budget": delay_budget}
+        if demand is not None and self.capacity_model is not None:
+            options["max_distance"], options["saturated"] = self._capacity_limits(demand)
+        if keep is not None:
+            options["keep"] = keep
+        if self.stats is None:
+            return self._search(start, end, exact_hops, alpha, beta, bounds, blocked, blocked_next, **options)
+        counters = {}
+        began = time.perf_counter()
+        result = self._search(start, end, exact_hops, alpha, beta, bounds, blocked, blocked_next, counters,
+                              **options)
+        self.stats.record(start=None if start is None else self.names[start], end=self.names[end],
+                          hops=exact_hops, cached=False, found=result is not None,
+                          search_s=time.perf_counter() - began, **counters)
+        return result
+
+    def _search(self, start, end, exact_hops, alpha, beta, bounds, blocked, blocked_next, counters=None,
+                delay_budget=None, max_distance=math.inf, saturated=frozenset(), keep=None):
+        """Body of _label_search(); the search counters go into `counters` when given.
+
+        With a one-way `delay_budget` (ms) labels also carry their delay: an
+        extension that cannot reach `end` within the budget is dropped, and a
+        label only dominates another that is no cheaper and no faster.
+        Without one every delay stays 0, so dominance is on cost alone.
+        """
+        self.expanded = 0
+        if start is None or not bounds or blocked >> start & 1:
+            return None
+        initial = self._bound(bounds[exact_hops - 1], start, None)
+        if initial == math.inf:
+            return None
+        budgeted = delay_budget is not None
+        start_delay = 0
+        if budgeted:
+            reach, constant = self.delay_floor(end, exact_hops)
+            start_delay = self.delays[start]
+            if start_delay + reach[start] + constant[exact_hops - 1] > delay_budget:
+                return None
+
+        loads = self.loads
+        delays = self.delays
+        propagation = self.propagation_delay
+        edge_ids = self.edge_ids
+        # label id -> (node, parent label id, visited mask, cost so far, delay so far)
+        labels = [(start, -1, 1 << start | blocked, 0, start_delay)]
+        expanded = defaultdict(list)
+        heap = [(initial, 1, start, 0)]
+        result = None
+        # Plain local counters; they only leave the loop into `counters`
+        pops = stale = scanned = pruned_bound = pruned_dominated = pruned_budget = pruned_capacity = peak = 0
+
+        while heap:
+            if len(heap) > peak:
+                peak = len(heap)
+            _, current_len, current_node, label = heapq.heappop(heap)
+            pops += 1
+            _, _, mask, current_cost, current_delay = labels[label]
+
+            if current_len == exact_hops:
+                if current_node == end:
+                    result = self._unwind(labels, label), current_cost
+                    break
+                continue
+
+            seen = expanded[current_node, current_len]
+            if any(other_cost <= current_cost and other_delay <= current_delay and other & mask == other
+                   for other, other_cost, other_delay in seen):
+                stale += 1
+                continue
+            seen.append((mask, current_cost, current_delay))
+            self.expanded += 1
+
+            next_len = current_len + 1
+            remaining = bounds[exact_hops - next_len]
+            if budgeted:
+                delay_left = constant[exact_hops - next_len]
+            new_delay = 0
+            for neighbor, distance in self._adjacent(current_node, keep):
+                scanned += 1
+                if distance > max_distance or saturated and (current_node, neighbor) in saturated:
+                    pruned_capacity += 1
+                    continue
+                rest = self._bound(remaining, neighbor, current_node)
+                if rest == math.inf:
+                    pruned_bound += 1
+                    continue
+                if mask >> neighbor & 1:
+                    continue
+                if neighbor == end and next_len != exact_hops:
+                    continue
+                if neighbor in edge_ids and neighbor != end:
+                    continue
+                if current_len == 1 and neighbor in blocked_next:
+                    continue
+                if budgeted:
+                    new_delay = current_delay + propagation * distance + delays[neighbor]
+                    if new_delay + reach[neighbor] + delay_left > delay_budget:
+                        pruned_budget += 1
+                        continue
+                new_mask = mask | 1 << neighbor
+                new_cost = current_cost + alpha * distance + beta * loads[neighbor]
+                if any(other_cost <= new_cost and other_delay <= new_delay and other & new_mask == other
+                       for other, other_cost, other_delay in expanded[neighbor, next_len]):
+                    pruned_dominated += 1
+                    continue
+                labels.append((neighbor, label, new_mask, new_cost, new_delay))
+                heapq.heappush(heap, (new_cost + rest, next_len, neighbor, len(labels) - 1))
+
+        if counters is not None:
+            pushes = len(labels) - 1
+            counters.update(pushes=pushes, pops=pops, expanded=self.expanded, stale_pops=stale,
+                            scanned=scanned, pruned_bound=pruned_bound, pruned_dominated=pruned_dominated,
+                            pruned_budget=pruned_budget, pruned_capacity=pruned_capacity,
+                            pruned_rules=(scanned - pushes - pruned_bound - pruned_dominated - pruned_budget
+                                          - pruned_capacity),
+                            max_heap=peak)
+        return result
+
+    @staticmethod
+    def _unwind(labels, label):
+        path = []
+        while label != -1:
+            node, label = labels[label][:2]
+            path.append(node)
+        path.reverse()
+        return path
+
+
+# Process pool workers for constrained_paths_to(workers=...)
+_worker = {}
+
+
+def _map_npz_member(path, name):
+    """Read-only memmap of an array stored uncompressed in an .npz file, or None."""
+    import struct
+    import zipfile
+
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, "rb") as f:
+        # Skip the zip local file header to reach the .npy header
+        f.seek(info.header_offset + 26)
+        name_length, extra_length = struct.unpack("<HH", f.read(4))
+        f.seek(name_length + extra_length, 1)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if dtype.hasobject or not math.prod(shape):
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+def _init_worker(shm_name, size, state, search):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    distances = np.ndarray((size,), np.float32, buffer=shm.buf)
+    _worker["shm"] = shm
+    _worker["network"] = UPFNetwork._from_snapshot(state, distances)
+    _worker["search"] = search
+
+
+def _solve_start(start):
+    end, exact_hops, alpha, beta, bounds = _worker["search"]
+    return _worker["network"]._label_search(start, end, exact_hops, alpha, beta, bounds)
+
+
+def rename_upfs(network, edge_upfs):
+    old_to_new = {}
+    i = 1
+    j = 1
+
+    for upf in network.upf_positions:
+        if upf == network.psa_upf:
+            new_name = network.psa_upf
+        elif upf in edge_upfs:
+            new_name = f"edge-upf{i}"
+            i += 1
+        else:
+            new_name = f"i-up{j}"
+            j += 1
+        old_to_new[upf] = new_name
+
+    network.relabel(old_to_new)
+    network.edge_upfs = {old_to_new[u] for u in edge_upfs}
+    return old_to_new
@@ -4,6 +4,8 @@ import logging
 import time
 from math import radians, sin, cos, sqrt, atan2
 
+import numpy as np
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -17,6 +19,10 @@ def haversine(lat1, lon1, lat2, lon2):
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     return 6371 * 2 * atan2(sqrt(a), sqrt(1 - a))
 
+def link_bandwidth(distance_km, original_bw=1000, attenuation_db_per_km=0.02, min_bandwidth=100):
+    """Bandwidth (Mbps) apply_distance() shapes a link of this length to; works on arrays."""
+    return np.maximum(original_bw * 10 ** (-attenuation_db_per_km * np.asarray(distance_km) / 10), min_bandwidth)
+
 def get_network_interface(container, target_ip=None):
     try:
         result = container.exec_run("ip -o link show", privileged=True)
@@ -151,7 +157,7 @@ def apply_distance(upf_coords, attenuation_db_per_km=0.02, min_bandwidth=100):
             return haversine(*a["coords"], *b["coords"])
 
         def calculate_bw(distance_km, original_bw):
-            return max(original_bw * (10 ** (-attenuation_db_per_km * distance_km / 10)), min_bandwidth)
+            return float(link_bandwidth(distance_km, original_bw, attenuation_db_per_km, min_bandwidth))
 
         for upf1_name, upf2_name in links:
             try:
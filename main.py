@@ -9,7 +9,7 @@ from datetime import datetime
 from colorama import init, Fore, Style
 
 # Import modules from utils
-from utils.distance import apply_distance
+from utils.distance import apply_distance, link_bandwidth
 from utils.insert import login, insert_ue
 from utils.generate_upf_configs import (
     generate_upf_config,
@@ -19,6 +19,28 @@ from utils.generate_upf_configs import (
 )
 from utils.measure_traffic_metrics import measure_traffic_metrics
 
+
+def add_planner_root():
+    """Put the directory holding the path planner's utils/ on sys.path.
+
+    The deployment helpers above and the planner (upf_network.py and the
+    modules it imports) live in two utils/ directories without an
+    __init__.py, so Python merges them into one utils namespace package.
+    Appending keeps the deployment modules first where both have a file.
+    UPF_PLANNER_ROOT overrides the lookup next to and around this script.
+    """
+    here = os.path.dirname(os.path.realpath(__file__))
+    candidates = [os.environ.get("UPF_PLANNER_ROOT"), here, os.path.join(here, "final"), os.path.dirname(here)]
+    for root in filter(None, candidates):
+        if os.path.isfile(os.path.join(root, "utils", "upf_network.py")):
+            if root not in sys.path:
+                sys.path.append(root)
+            return root
+    return None
+
+
+add_planner_root()
+
 # Initialize colorama for colored terminal output
 init(autoreset=True)
 
@@ -316,82 +338,48 @@ def handle_upf_topology():
         gnb_pos = (gnb_x, gnb_y)
         print_success(f"gNB configured at: {gnb_pos}")
         
-        # Configure UPF coordinates
-        print_info("Enter geographic coordinates for each UPF:")
-        upf_positions = {}
+        # Path engine shared with interface.py
+        from utils.upf_network import UPFNetwork
+        
+        # A snapshot saved by the planner replaces the coordinate prompts
+        network = None
+        snapshot = get_user_input("Topology snapshot to load (.npz, empty to enter coordinates)", default="")
+        if snapshot:
+            try:
+                network = UPFNetwork.load(snapshot)
+            except (OSError, ValueError, KeyError) as e:
+                print_error(f"Could not load snapshot: {e}")
+            else:
+                if len(network.names) != num_upfs:
+                    print_warning(f"Snapshot has {len(network.names)} UPFs, expected {num_upfs}; entering coordinates instead")
+                    network = None
+                else:
+                    print_success(f"Loaded {num_upfs} UPFs ({network.metric} distances) from {snapshot}")
+        
+        if network is None:
+            # Configure UPF coordinates
+            print_info("Enter geographic coordinates for each UPF:")
+            upf_positions = {}
         
-        for i in range(1, num_upfs):
-            name = f"upf{i}"
-            print(f"\n{Fore.YELLOW}UPF: {name}{Style.RESET_ALL}")
-            x = float(get_user_input(f"Enter x (latitude) for {name}"))
-            y = float(get_user_input(f"Enter y (longitude) for {name}"))
-            upf_positions[name] = (x, y)
+            for i in range(1, num_upfs):
+                name = f"upf{i}"
+                print(f"\n{Fore.YELLOW}UPF: {name}{Style.RESET_ALL}")
+                x = float(get_user_input(f"Enter x (latitude) for {name}"))
+                y = float(get_user_input(f"Enter y (longitude) for {name}"))
+                upf_positions[name] = (x, y)
         
-        # PSA-UPF coordinates
-        print(f"\n{Fore.YELLOW}UPF: psa{Style.RESET_ALL}")
-        psa_x = float(get_user_input("Enter x (latitude) for PSA-UPF"))
-        psa_y = float(get_user_input("Enter y (longitude) for PSA-UPF"))
-        psa_pos = (psa_x, psa_y)
-        upf_positions["psa"] = psa_pos
+            # PSA-UPF coordinates
+            print(f"\n{Fore.YELLOW}UPF: psa{Style.RESET_ALL}")
+            psa_x = float(get_user_input("Enter x (latitude) for PSA-UPF"))
+            psa_y = float(get_user_input("Enter y (longitude) for PSA-UPF"))
+            psa_pos = (psa_x, psa_y)
+            upf_positions["psa"] = psa_pos
         
         # Initialize network for path calculation
         print_section("Path Optimization")
         print_info("Calculating optimal UPF path...")
         
-        # Import the UPFNetwork class from interface.py logic
-        import math
-        from collections import defaultdict
-        import heapq
-        
-        class UPFNetwork:
-            def __init__(self):
-                self.graph = defaultdict(dict)
-                self.upf_loads = defaultdict(int)
-                self.upf_positions = {}
-                self.psa_position = None
-                self.psa_upf = "psa"
-                self.edge_upfs = set()
-
-            def add_upf(self, upf_id, position):
-                self.upf_positions[upf_id] = position
-
-            def set_psa(self, position):
-                self.psa_position = position
-                self.upf_positions[self.psa_upf] = position
-
-            def connect_upfs(self, upf1, upf2):
-                distance = math.dist(self.upf_positions[upf1], self.upf_positions[upf2])
-                self.graph[upf1][upf2] = distance
-                self.graph[upf2][upf1] = distance
-
-            def constrained_dijkstra(self, start, end, exact_hops, alpha=1.0, beta=0.5):
-                heap = []
-                heapq.heappush(heap, (0, 1, start, [start]))
-
-                while heap:
-                    current_cost, current_len, current_node, path = heapq.heappop(heap)
-
-                    if current_len == exact_hops:
-                        if current_node == end:
-                            return path, current_cost
-                        continue
-
-                    for neighbor, distance in self.graph[current_node].items():
-                        if neighbor in path:
-                            continue
-                        if neighbor in self.edge_upfs and neighbor != end:
-                            continue
-                        new_path = path + [neighbor]
-                        step_cost = alpha * distance + beta * self.upf_loads[neighbor]
-                        new_cost = current_cost + step_cost
-                        heapq.heappush(heap, (new_cost, current_len + 1, neighbor, new_path))
-
-                raise ValueError(f"No valid path of exactly {exact_hops} nodes from {start} to {end}")
-        
         def rename_upfs(network, edge_upfs):
-            renamed_positions = {}
-            renamed_loads = {}
-            renamed_graph = defaultdict(dict)
             old_to_new = {}
             new_to_old = {}
             i = 1
@@ -409,52 +397,33 @@ def handle_upf_topology():
                 old_to_new[upf] = new_name
                 new_to_old[new_name] = upf
 
-            # Update positions and loads
-            for old, new in old_to_new.items():
-                renamed_positions[new] = network.upf_positions[old]
-                renamed_loads[new] = network.upf_loads[old]
-
-            # Update graph
-            for old_src, neighbors in network.graph.items():
-                new_src = old_to_new[old_src]
-                for old_dst, dist in neighbors.items():
-                    new_dst = old_to_new[old_dst]
-                    renamed_graph[new_src][new_dst] = dist
-
             # Apply changes to network
-            network.upf_positions = renamed_positions
-            network.upf_loads = renamed_loads
-            network.graph = renamed_graph
+            network.relabel(old_to_new)
             network.edge_upfs = {old_to_new[u] for u in edge_upfs}
             return old_to_new, new_to_old
         
-        # Create network and add UPFs
-        network = UPFNetwork()
+        if network is None:
+            # Create network and add UPFs; positions are latitude/longitude, so
+            # path costs use the same great-circle distances as the tc shaping
+            network = UPFNetwork(metric="haversine")
         
-        # Add all UPFs to network
-        for upf_id, position in upf_positions.items():
-            if upf_id == "psa":
-                network.set_psa(position)
-            else:
-                network.add_upf(upf_id, position)
+            # Add all UPFs to network
+            for upf_id, position in upf_positions.items():
+                if upf_id == "psa":
+                    network.set_psa(position)
+                else:
+                    network.add_upf(upf_id, position)
         
-        # Connect all UPFs to each other (fully connected graph)
-        all_upfs = list(network.upf_positions.keys())
-        for i in range(len(all_upfs)):
-            for j in range(i+1, len(all_upfs)):
-                network.connect_upfs(all_upfs[i], all_upfs[j])
+            # Connect all UPFs to each other (fully connected graph) unless a
+            # nearest-neighbor topology was requested
+            k_nearest = get_user_input("Connect each UPF to its k nearest UPFs (0 for a full mesh)", default="0", is_int=True, min_value=0)
+            if k_nearest:
+                network.connect_nearest(k_nearest)
+            else:
+                network.connect_all()
         
         # Find the closest UPF to gNB to serve as edge UPF
-        min_distance = float('inf')
-        edge_upf = None
-        
-        for upf_id, upf_pos in network.upf_positions.items():
-            if upf_id == network.psa_upf:
-                continue
-            distance = math.dist(gnb_pos, upf_pos)
-            if distance < min_distance:
-                min_distance = distance
-                edge_upf = upf_id
+        edge_upf, min_distance = network.nearest_upfs(gnb_pos)[0]
         
         print_success(f"Selected edge UPF: {edge_upf} (closest to gNB)")
         
@@ -466,16 +435,58 @@ def handle_upf_topology():
         old_to_new, new_to_old = rename_upfs(network, {edge_upf})
         renamed_edge_upf = old_to_new[edge_upf]
         
+        # One-way delay budget for the uRLLC path, e.g. 1 ms
+        delay_budget = get_user_input("One-way delay budget for the UPF path in ms (empty for none)", default="")
+        delay_budget = float(delay_budget) if delay_budget else None
+        
+        # Per-UE bandwidth: the path must have it free on every link under the
+        # same attenuation model apply_distance() shapes the links with
+        ue_demand = get_user_input("Bandwidth per UE in Mbps (empty for none)", default="")
+        demand = float(ue_demand) * num_ues if ue_demand else None
+        if demand is not None:
+            network.capacity_model = link_bandwidth
+            flow = network.max_flow({renamed_edge_upf: demand})
+            print_info(f"Max-flow check: {flow:.0f} of {demand:.0f} Mbps can reach the PSA UPF")
+            if flow < demand - 1e-6:
+                print_warning("The UPF links cannot carry every UE's bandwidth")
+        
+        # Optional search instrumentation for this planning run
+        stats_path = get_user_input("Export routing search statistics to JSON (empty to skip)", default="")
+        if stats_path:
+            from utils.search_stats import SearchStats
+            network.stats = SearchStats()
+        
+        # Cost of every path length, to see whether another m pays off
+        max_hops = get_user_input("Compare path costs for every m up to (0 to skip)", default="0", is_int=True, min_value=0)
+        if max_hops:
+            table = network.hop_table(renamed_edge_upf, "psa-upf", max_hops, alpha=1.0, beta=0.5)
+            print_info("Path lengths that lower the cost (Pareto frontier):")
+            for hops, path, cost in network.pareto_frontier(table):
+                print_info(f"m={hops}: cost {cost:.2f} via {' -> '.join(path)}")
+            if not table:
+                print_warning(f"No path of at most {max_hops} UPFs reaches the PSA UPF")
+        
         # Calculate optimal path
         try:
-            path, cost = network.constrained_dijkstra(renamed_edge_upf, "psa-upf", m, alpha=1.0, beta=0.5)
+            path, cost = network.constrained_dijkstra(renamed_edge_upf, "psa-upf", m, alpha=1.0, beta=0.5,
+                                                      delay_budget=delay_budget, demand=demand)
             
             # Update loads for UPFs in the path
             for upf in path[1:-1]:
                 network.upf_loads[upf] += num_ues
+            if demand is not None:
+                network.reserve_path(path, demand)
             
             print_success(f"Optimal path found: {' -> '.join(path)}")
-            print_info(f"Path cost: {cost:.2f}")
+            print_info(f"Path cost: {cost:.2f}, one-way delay: {network.path_delay(path):.3f} ms")
+            
+            # Failover path kept ready so losing an intermediate UPF is a config swap
+            backup = network.backup_path(path, alpha=1.0, beta=0.5, delay_budget=delay_budget, demand=demand)
+            if backup is None:
+                print_warning("No backup path avoids the intermediate UPFs of this path")
+            else:
+                shared = ", ".join(backup[2]) or "none"
+                print_info(f"Backup path: {' -> '.join(backup[0])} (cost: {backup[1]:.2f}, shared UPFs: {shared})")
             
             # Update UPF path in configuration files
             try:
@@ -495,6 +506,16 @@ def handle_upf_topology():
             print_warning("Continuing with default configuration...")
             path = []
         
+        if network.stats is not None:
+            print_info(f"Search stats: {network.stats.summary()}")
+            network.stats.to_json(stats_path)
+            print_success(f"Search statistics written to {stats_path}")
+        
+        save_path = get_user_input("Save the planned topology snapshot to (.npz, empty to skip)", default="")
+        if save_path:
+            network.save(save_path)
+            print_success(f"Topology snapshot written to {save_path}")
+        
         # Prepare coordinates for distance-based shaping
         print_section("Distance-based Bandwidth Shaping")
         upf_coords = {}